@@ -3,7 +3,7 @@ from flask_sqlalchemy import SQLAlchemy
 import logging
 import os
 from app.authentication.KeyManager import KeyManager
-from constants import ACCESS_TOKEN_PUBLICKEY_BASEPATH, IS_VALIDATION_ENABLED
+from constants import ACCESS_TOKEN_PUBLICKEY_BASEPATH, ACCESS_TOKEN_PUBLICKEY_RELOAD_SECONDS, IS_VALIDATION_ENABLED
 
 db = SQLAlchemy()
 
@@ -32,6 +32,8 @@ def create_app():
             raise ValueError("ACCESS_TOKEN_PUBLICKEY_BASEPATH is not set.")
         KeyManager.init(base_path)
         logger.info("KeyManager initialized successfully.")
+        # Picks up rotated keys without a restart
+        KeyManager.start_watcher(base_path, ACCESS_TOKEN_PUBLICKEY_RELOAD_SECONDS)
 
     try:
         from app.controllers.report_controller import report_controller
@@ -40,6 +42,10 @@ def create_app():
         # Register health_controller
         from app.controllers.health_controller import health_controller
         app.register_blueprint(health_controller)
+
+        # Register metrics_controller
+        from app.controllers.metrics_controller import metrics_controller
+        app.register_blueprint(metrics_controller)
     except Exception as e:
         app.logger.error(f"Blueprint registration failed: {e}")
         raise
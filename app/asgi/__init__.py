@@ -0,0 +1,47 @@
+import logging
+from quart import Quart
+from app.authentication.KeyManager import KeyManager
+from app.asgi.db_connection import AsyncDBConnection
+from constants import ACCESS_TOKEN_PUBLICKEY_BASEPATH, ACCESS_TOKEN_PUBLICKEY_RELOAD_SECONDS, IS_VALIDATION_ENABLED
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def create_asgi_app():
+    """
+    ASGI variant of create_app(), serving the report and health endpoints
+    from one event loop per process, e.g.
+    hypercorn --bind 0.0.0.0:5000 "app.asgi:create_asgi_app()"
+    """
+    app = Quart(__name__)
+    # Reports stream for as long as the gunicorn timeout allows, not Quart's 60 second default
+    app.config["RESPONSE_TIMEOUT"] = 900
+
+    if IS_VALIDATION_ENABLED.lower() == 'true':
+        base_path = ACCESS_TOKEN_PUBLICKEY_BASEPATH
+        if not base_path:
+            logger.error("ACCESS_TOKEN_PUBLICKEY_BASEPATH is not set.")
+            raise ValueError("ACCESS_TOKEN_PUBLICKEY_BASEPATH is not set.")
+        KeyManager.init(base_path)
+        KeyManager.start_watcher(base_path, ACCESS_TOKEN_PUBLICKEY_RELOAD_SECONDS)
+        logger.info("KeyManager initialized successfully.")
+
+    @app.before_serving
+    async def open_pool():
+        try:
+            await AsyncDBConnection.init_pool()
+        except Exception as e:
+            logger.error(f"Database initialization failed: {e}")
+            raise RuntimeError("Application startup aborted due to database connection failure.")
+
+    @app.after_serving
+    async def close_pool():
+        await AsyncDBConnection.close_pool()
+
+    from app.asgi.report_controller import report_controller
+    app.register_blueprint(report_controller)
+
+    from app.asgi.health_controller import health_controller
+    app.register_blueprint(health_controller)
+
+    return app
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+import asyncpg
+from app.config.db_config import Config
+from app.config.db_connection import ConnectionPoolTimeout
+from constants import DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_CHECKOUT_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDBConnection:
+    """
+    asyncpg connection pool of the ASGI app, one per process and event loop.
+
+    Waiting for a connection or a query suspends only the request that
+    waits, so one process serves many reports and the health endpoints
+    concurrently.
+    """
+    _pool = None
+
+    @classmethod
+    async def init_pool(cls):
+        if cls._pool is None:
+            credentials = Config.get_db_credentials()
+            cls._pool = await asyncpg.create_pool(
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=DB_POOL_MAX_SIZE,
+                user=credentials['user'],
+                password=credentials['password'],
+                host=credentials['host'],
+                port=int(credentials['port']),
+                database=credentials['database']
+            )
+            logger.info(f"Async connection pool created (min={DB_POOL_MIN_SIZE}, max={DB_POOL_MAX_SIZE})")
+        return cls._pool
+
+    @classmethod
+    async def close_pool(cls):
+        if cls._pool is not None:
+            await cls._pool.close()
+            cls._pool = None
+
+    @classmethod
+    @asynccontextmanager
+    async def connection(cls, timeout=None):
+        timeout = DB_POOL_CHECKOUT_TIMEOUT if timeout is None else timeout
+        connection_pool = await cls.init_pool()
+        try:
+            connection = await connection_pool.acquire(timeout=timeout)
+        except asyncio.TimeoutError:
+            raise ConnectionPoolTimeout(f"Timed out after {timeout} seconds waiting for a database connection.")
+        try:
+            yield connection
+        finally:
+            # Rolls back an open transaction, or closes the connection when that fails
+            await connection_pool.release(connection)
+
+    @classmethod
+    def stats(cls):
+        connection_pool = cls._pool
+        if connection_pool is None:
+            return {"min_size": DB_POOL_MIN_SIZE, "max_size": DB_POOL_MAX_SIZE, "in_use": 0, "idle": 0}
+        size = connection_pool.get_size()
+        idle = connection_pool.get_idle_size()
+        return {
+            "min_size": connection_pool.get_min_size(),
+            "max_size": connection_pool.get_max_size(),
+            "in_use": size - idle,
+            "idle": idle
+        }
@@ -0,0 +1,38 @@
+import logging
+from quart import Blueprint, jsonify
+from app.asgi.db_connection import AsyncDBConnection
+from app.config.db_connection import ConnectionPoolTimeout
+from constants import HEALTH_CHECK_CHECKOUT_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+health_controller = Blueprint('async_health_controller', __name__)
+
+@health_controller.route('/health', methods=['GET'])
+async def health_check():
+    try:
+        async with AsyncDBConnection.connection(timeout=HEALTH_CHECK_CHECKOUT_TIMEOUT) as connection:
+            result = await connection.fetchval("SELECT 1")
+        if result == 1:
+            logger.info("PostgreSQL connection is healthy.")
+            return jsonify({"status": "True", "postgresDB": {"status": "Connected", "pool": AsyncDBConnection.stats()}}), 200
+        else:
+            raise Exception("Invalid response from database")
+    except ConnectionPoolTimeout as e:
+        # Postgres may be fine, all pooled connections are serving reports
+        logger.warning(f"Health check found no free database connection: {e}")
+        return jsonify({
+            "status": "False",
+            "postgresDB": {"status": "busy", "pool": AsyncDBConnection.stats()}
+        }), 503
+    except Exception as e:
+        logger.error(f"Health check failed: {e}")
+        return jsonify({
+            "status": "False",
+            "postgresDB": {"status": "down", "pool": AsyncDBConnection.stats()}
+        }), 500
+
+@health_controller.route('/liveness', methods=['GET'])
+async def liveness_check():
+    logger.info("Liveness check endpoint called.")
+    return jsonify({"status": "OK"}), 200
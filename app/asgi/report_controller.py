@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import time as time_module
+from quart import Blueprint, request, jsonify, Response
+from app.asgi.report_service import AsyncReportService
+from app.config.db_connection import ConnectionPoolTimeout
+from app.controllers.report_request import ReportRequestError, authorize_org, parse_date_range, resolve_columns
+from app.utils.compression import available_encodings
+from constants import X_AUTHENTICATED_USER_TOKEN
+
+logger = logging.getLogger(__name__)
+
+report_controller = Blueprint('async_report_controller', __name__)
+
+
+@report_controller.route('/report/org/<org_id>', methods=['POST'])
+async def get_report(org_id):
+    start_timer = time_module.time()
+    try:
+        logger.info(f"Received request to generate report for org_id={org_id}")
+        # Verifying an uncached token is an RSA signature check, keep it off the event loop
+        await asyncio.get_running_loop().run_in_executor(
+            None, authorize_org, org_id, request.headers.get(X_AUTHENTICATED_USER_TOKEN)
+        )
+
+        # Parse and validate date range and columns
+        data = await request.get_json()
+        start_date, end_date = parse_date_range(data)
+        logger.info(f"Generating report for org_id={org_id} from {start_date} to {end_date}")
+        required_columns = resolve_columns(data)
+
+        # Only plain CSV streams are served here, the other variants stay on the WSGI app
+        output_format = str(request.args.get('format', data.get('format', 'csv'))).lower()
+        encrypt = str(request.args.get('encrypt', data.get('encrypt', 'false'))).lower() == 'true'
+        run_async = str(request.args.get('async', data.get('async', 'false'))).lower() == 'true'
+        if output_format != 'csv' or encrypt or run_async:
+            return jsonify({'error': 'Only synchronous, unencrypted CSV reports are available on this endpoint.'}), 400
+
+        encoding = request.accept_encodings.best_match(available_encodings())
+
+        report_chunks = AsyncReportService.stream_total_learning_hours_csv(
+            start_date, end_date, org_id, required_columns=required_columns, encoding=encoding
+        )
+        try:
+            # Pull the first chunk eagerly so empty reports and early failures still get a proper status code
+            try:
+                first_chunk = await report_chunks.__anext__()
+            except StopAsyncIteration:
+                logger.warning(f"No data found for org_id={org_id} within given date range.")
+                return jsonify({'error': 'No data found for the given organization ID.'}), 404
+
+        except ConnectionPoolTimeout as e:
+            error_message = str(e)
+            logger.error(f"No database connection available for org_id={org_id}: {error_message}")
+            return jsonify({'error': 'The service is busy. Please try again later.', 'details': error_message}), 503
+
+        except Exception as e:
+            error_message = str(e)
+            logger.error(f"Error generating CSV stream for org_id={org_id}: {error_message}")
+            return jsonify({'error': 'Failed to generate the report due to an internal error.', 'details': error_message}), 500
+
+        time_taken = round(time_module.time() - start_timer, 2)
+        logger.info(f"Report streaming started for org_id={org_id} after {time_taken} seconds")
+
+        headers = {
+            "Content-Disposition": f'attachment; filename="report_{org_id}.csv"',
+            "Vary": "Accept-Encoding"
+        }
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(
+            _stream_report(org_id, first_chunk, report_chunks, start_timer),
+            mimetype="text/csv",
+            headers=headers
+        )
+
+    except ReportRequestError as e:
+        return jsonify(e.body), e.status
+
+    except KeyError as e:
+        error_message = str(e)
+        logger.error(f"Missing required fields in request: {error_message}")
+        return jsonify({'error': 'Invalid input. Please provide start_date and end_date.', 'details': error_message}), 400
+
+    except ValueError as e:
+        error_message = str(e)
+        logger.error(f"Invalid date format in request: {error_message}")
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD.', 'details': error_message}), 400
+
+    except Exception as e:
+        error_message = str(e)
+        logger.exception(f"Unexpected error occurred: {error_message}")
+        return jsonify({'error': 'An unexpected error occurred. Please try again later.', 'details': error_message}), 500
+
+
+async def _stream_report(org_id, first_chunk, chunks, start_timer):
+    try:
+        yield first_chunk
+        async for chunk in chunks:
+            yield chunk
+        time_taken = round(time_module.time() - start_timer, 2)
+        logger.info(f"Report generated successfully for org_id={org_id} in {time_taken} seconds")
+    except Exception as e:
+        # Headers are already sent, abort the chunked body so the client sees a truncated transfer
+        logger.exception(f"Error while streaming report for org_id={org_id}: {e}")
+        raise
+    finally:
+        await chunks.aclose()
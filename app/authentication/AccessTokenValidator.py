@@ -1,18 +1,70 @@
 import base64
+import hashlib
 import json
 import logging
+import threading
+import time
+from collections import OrderedDict
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.serialization import load_der_public_key
 from datetime import datetime
 from app.authentication.KeyManager import KeyManager
-from constants import SUNBIRD_SSO_URL, SUNBIRD_SSO_REALM
+from app.utils.metrics import AUTH_DURATION, AUTH_TOKEN_CACHE
+from constants import SUNBIRD_SSO_URL, SUNBIRD_SSO_REALM, ACCESS_TOKEN_CACHE_MAX_ENTRIES
 logger = logging.getLogger(__name__)
 
+
+class _VerifiedTokenCache:
+    """
+    Bounded LRU map of token digests to the payload of tokens whose signature
+    has been verified. An entry is dropped when the token expires or the key
+    it was verified with is no longer the one KeyManager returns for its kid.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, digest):
+        if self.max_entries <= 0:
+            return None
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry is not None:
+                payload, key_id, public_key, expires_at = entry
+                if time.time() < expires_at and KeyManager.get_public_key(key_id) is public_key:
+                    self.entries.move_to_end(digest)
+                    AUTH_TOKEN_CACHE.labels(result="hit").inc()
+                    return dict(payload)
+                del self.entries[digest]
+        AUTH_TOKEN_CACHE.labels(result="miss").inc()
+        return None
+
+    def put(self, digest, payload, key_id, public_key):
+        expires_at = payload.get("exp")
+        if self.max_entries <= 0 or not isinstance(expires_at, (int, float)) or expires_at <= time.time():
+            return
+        with self.lock:
+            self.entries[digest] = (dict(payload), key_id, public_key, expires_at)
+            self.entries.move_to_end(digest)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
 class AccessTokenValidator:
+    token_cache = _VerifiedTokenCache(ACCESS_TOKEN_CACHE_MAX_ENTRIES)
+
     @staticmethod
     def validate_token(token, check_active):
         try:
+            # Cached tokens were verified before and have not expired yet, so check_active holds as well
+            token_digest = hashlib.sha256(token.encode("utf-8")).digest()
+            cached_payload = AccessTokenValidator.token_cache.get(token_digest)
+            if cached_payload is not None:
+                return cached_payload
+
             header, payload, signature = token.split(".")
             decoded_header = json.loads(base64.urlsafe_b64decode(header + "==").decode("utf-8"))
             decoded_payload = json.loads(base64.urlsafe_b64decode(payload + "==").decode("utf-8"))
@@ -45,6 +97,7 @@ class AccessTokenValidator:
             if check_active and AccessTokenValidator.is_expired(decoded_payload.get("exp")):
                 return {}
 
+            AccessTokenValidator.token_cache.put(token_digest, decoded_payload, key_id, public_key_pem)
             return decoded_payload
         except Exception as ex:
             logger.error("Exception in AccessTokenValidator: validate_token", exc_info=ex)
@@ -68,6 +121,7 @@ class AccessTokenValidator:
     @staticmethod
     def verify_user_token_get_org(token, check_active):
         logger.debug("Inside the verify_user_token method")
+        start_time = time.perf_counter()
         org_id = ""
         try:
             payload = AccessTokenValidator.validate_token(token, check_active)
@@ -76,6 +130,7 @@ class AccessTokenValidator:
                 org_id = payload.get("org", "")
         except Exception as ex:
             logger.error("Exception in AccessTokenValidator: verify_user_token", exc_info=ex)
+        AUTH_DURATION.labels(result="valid" if org_id else "invalid").observe(time.perf_counter() - start_time)
         return org_id
 
     @staticmethod
@@ -1,29 +1,102 @@
 import os
 import base64
 import logging
+import threading
+from types import MappingProxyType
 from cryptography.hazmat.primitives.serialization import load_der_public_key
 from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey
 
 logger = logging.getLogger(__name__)
 
 class KeyManager:
-    key_map = {}
+    # Replaced as a whole on every reload, readers never see a partially updated map
+    key_map = MappingProxyType({})
+    _loaded_files = {}
+    _reload_lock = threading.Lock()
+    _watcher = None
+    _stop_watcher = threading.Event()
 
     @staticmethod
     def init(base_path):
-        try:
-            for root, _, files in os.walk(base_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    try:
-                        with open(file_path, "r", encoding="utf-8") as f:
-                            content = f.read()
-                            public_key = KeyManager.load_public_key(content)
-                            KeyManager.key_map[file] = public_key
-                    except Exception as e:
-                        logger.error(f"KeyManager:init: exception in reading public key from {file_path}", exc_info=e)
-        except Exception as e:
-            logger.error("KeyManager:init: exception in loading public keys", exc_info=e)
+        KeyManager.reload(base_path)
+
+    @staticmethod
+    def reload(base_path):
+        """
+        Parses the key files added or changed since the last load and swaps in
+        the new key map. Keys of unchanged files are reused as they are.
+        Returns True when the key map was replaced.
+        """
+        with KeyManager._reload_lock:
+            walk_errors = []
+            loaded_files = {}
+            keys = {}
+            changed = False
+            try:
+                for root, _, files in os.walk(base_path, onerror=walk_errors.append):
+                    for file in files:
+                        file_path = os.path.join(root, file)
+                        previous_fingerprint, public_key = KeyManager._loaded_files.get(file_path, (None, None))
+                        fingerprint = None
+                        try:
+                            stat = os.stat(file_path)
+                            fingerprint = (stat.st_mtime_ns, stat.st_size)
+                            if fingerprint != previous_fingerprint:
+                                with open(file_path, "r", encoding="utf-8") as f:
+                                    content = f.read()
+                                public_key = KeyManager.load_public_key(content)
+                                changed = True
+                        except Exception as e:
+                            # Possibly caught mid-write, keep the previous key until the file changes again
+                            logger.error(f"KeyManager:reload: exception in reading public key from {file_path}", exc_info=e)
+                        loaded_files[file_path] = (fingerprint, public_key)
+                        if public_key is not None:
+                            keys[file] = public_key
+            except Exception as e:
+                logger.error("KeyManager:reload: exception in loading public keys", exc_info=e)
+                return False
+
+            if walk_errors:
+                # An unreadable directory would otherwise look like every key was removed
+                logger.error(f"KeyManager:reload: cannot read {base_path}, keeping the current keys", exc_info=walk_errors[0])
+                return False
+
+            changed = changed or loaded_files.keys() != KeyManager._loaded_files.keys()
+            KeyManager._loaded_files = loaded_files
+            if not changed:
+                return False
+            KeyManager.key_map = MappingProxyType(keys)
+            logger.info(f"KeyManager: loaded {len(keys)} public keys from {base_path}")
+            return True
+
+    @staticmethod
+    def start_watcher(base_path, interval):
+        """
+        Reloads the keys every interval seconds in a daemon thread of this
+        process. Has to be called after the worker process was forked.
+        """
+        if interval <= 0 or KeyManager._watcher is not None:
+            return
+        KeyManager._stop_watcher.clear()
+        KeyManager._watcher = threading.Thread(
+            target=KeyManager._watch, args=(base_path, interval), name="key-manager-watcher", daemon=True
+        )
+        KeyManager._watcher.start()
+
+    @staticmethod
+    def stop_watcher():
+        KeyManager._stop_watcher.set()
+        if KeyManager._watcher is not None:
+            KeyManager._watcher.join()
+            KeyManager._watcher = None
+
+    @staticmethod
+    def _watch(base_path, interval):
+        while not KeyManager._stop_watcher.wait(interval):
+            try:
+                KeyManager.reload(base_path)
+            except Exception as e:
+                logger.error("KeyManager:watch: exception in reloading public keys", exc_info=e)
 
     @staticmethod
     def get_public_key(key_id):
@@ -1,27 +1,186 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
 import psycopg2
+from psycopg2 import pool, extensions
 from ..config.db_config import Config
+from ..utils.metrics import set_pool_usage
+from constants import DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_CHECKOUT_TIMEOUT, DB_POOL_PING_IDLE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPoolTimeout(Exception):
+    pass
+
 
 class DBConnection:
-    _connection = None
-    _is_revoked = True  # Flag to track if the connection is revoked
+    """
+    Process-wide psycopg2 connection pool.
+
+    Connections are checked out with get_connection() (or the connection()
+    context manager) and must be handed back with release_connection().
+    The pool is created lazily in each process, so gunicorn workers never
+    share sockets inherited from the master. Connections that sat idle for
+    more than DB_POOL_PING_IDLE_SECONDS are pinged on checkout, since a
+    socket the server dropped meanwhile still looks healthy to psycopg2.
+    """
+    _pool = None
+    _slots = None  # Bounds concurrent checkouts so waiters block instead of failing
+    _lock = threading.Lock()
+    _stats = {"checkouts": 0, "timeouts": 0, "evicted": 0}
+    _idle_since = {}  # id(connection) -> monotonic time it was handed back
+    _inherited_pools = []
 
     @classmethod
-    def get_connection(cls):
-        if cls._connection is None or cls._is_revoked:
-            credentials = Config.get_db_credentials()
-            cls._connection = psycopg2.connect(
-                user=credentials['user'],
-                password=credentials['password'],
-                host=credentials['host'],
-                port=credentials['port'],
-                database=credentials['database']
-            )
-            cls._is_revoked = False
-        return cls._connection
+    def _get_pool(cls):
+        if cls._pool is None:
+            with cls._lock:
+                if cls._pool is None:
+                    credentials = Config.get_db_credentials()
+                    cls._pool = pool.ThreadedConnectionPool(
+                        DB_POOL_MIN_SIZE,
+                        DB_POOL_MAX_SIZE,
+                        user=credentials['user'],
+                        password=credentials['password'],
+                        host=credentials['host'],
+                        port=credentials['port'],
+                        database=credentials['database']
+                    )
+                    cls._slots = threading.BoundedSemaphore(DB_POOL_MAX_SIZE)
+                    logger.info(f"Connection pool created in pid={os.getpid()} (min={DB_POOL_MIN_SIZE}, max={DB_POOL_MAX_SIZE})")
+        return cls._pool
+
+    @classmethod
+    def get_connection(cls, timeout=None):
+        timeout = DB_POOL_CHECKOUT_TIMEOUT if timeout is None else timeout
+        connection_pool = cls._get_pool()
+
+        if not cls._slots.acquire(timeout=timeout):
+            cls._count("timeouts")
+            raise ConnectionPoolTimeout(f"Timed out after {timeout} seconds waiting for a database connection.")
+
+        try:
+            connection = connection_pool.getconn()
+            # Evict connections that are known broken, or that fail a ping after sitting idle for a while
+            while cls._is_broken(connection) or not cls._is_alive(connection):
+                cls._count("evicted")
+                logger.warning("Evicting broken connection from the pool.")
+                connection_pool.putconn(connection, close=True)
+                connection = connection_pool.getconn()
+        except Exception:
+            cls._slots.release()
+            raise
+
+        cls._count("checkouts")
+        cls._publish_usage()
+        return connection
+
+    @classmethod
+    def release_connection(cls, connection, broken=False):
+        if connection is None or cls._pool is None:
+            return
+        close = broken or cls._is_broken(connection)
+        if close:
+            cls._count("evicted")
+        try:
+            # putconn rolls back any open transaction before the connection is reused
+            cls._pool.putconn(connection, close=close)
+            if not connection.closed:
+                # The pool closes connections beyond its minimum size, only idle ones are tracked
+                with cls._lock:
+                    cls._idle_since[id(connection)] = time.monotonic()
+        except Exception as e:
+            logger.error(f"Error returning connection to the pool: {e}")
+        finally:
+            cls._slots.release()
+            cls._publish_usage()
+
+    @classmethod
+    @contextmanager
+    def connection(cls, timeout=None):
+        connection = cls.get_connection(timeout)
+        broken = False
+        try:
+            yield connection
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            cls.release_connection(connection, broken=broken)
+
+    @classmethod
+    def available_connections(cls):
+        """
+        Returns how many more connections could be checked out right now without waiting.
+        """
+        connection_pool = cls._get_pool()
+        return max(connection_pool.maxconn - len(connection_pool._used), 0)
+
+    @classmethod
+    def stats(cls):
+        connection_pool = cls._pool
+        with cls._lock:
+            stats = dict(cls._stats)
+        if connection_pool is None:
+            return {"min_size": DB_POOL_MIN_SIZE, "max_size": DB_POOL_MAX_SIZE, "in_use": 0, "idle": 0, **stats}
+        return {
+            "min_size": connection_pool.minconn,
+            "max_size": connection_pool.maxconn,
+            "in_use": len(connection_pool._used),
+            "idle": len(connection_pool._pool),
+            **stats
+        }
+
+    @classmethod
+    def _count(cls, stat):
+        with cls._lock:
+            cls._stats[stat] += 1
+
+    @classmethod
+    def _publish_usage(cls):
+        connection_pool = cls._pool
+        if connection_pool is not None:
+            set_pool_usage(len(connection_pool._used), len(connection_pool._pool))
 
     @classmethod
     def close_connection(cls):
-        if cls._connection:
-            cls._connection.close()
-            cls._connection = None
-            cls._is_revoked = True  # Set the revoked flag when the connection is closed
+        if cls._pool:
+            cls._pool.closeall()
+            cls._pool = None
+
+    @classmethod
+    def _reset_after_fork(cls):
+        # Closing inherited connections would terminate the parent's sessions, so keep them referenced and start over
+        if cls._pool is not None:
+            cls._inherited_pools.append(cls._pool)
+        cls._pool = None
+        cls._slots = None
+        cls._lock = threading.Lock()
+        cls._stats = {"checkouts": 0, "timeouts": 0, "evicted": 0}
+        cls._idle_since = {}
+
+    @staticmethod
+    def _is_broken(connection):
+        return connection.closed or connection.info.transaction_status == extensions.TRANSACTION_STATUS_UNKNOWN
+
+    @classmethod
+    def _is_alive(cls, connection):
+        with cls._lock:
+            # Fresh connections have no entry and are not pinged
+            idle_since = cls._idle_since.pop(id(connection), None)
+        if idle_since is None or time.monotonic() - idle_since < DB_POOL_PING_IDLE_SECONDS:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            logger.warning(f"Pooled connection failed its liveness check after {time.monotonic() - idle_since:.0f} seconds idle: {e}")
+            return False
+
+
+os.register_at_fork(after_in_child=DBConnection._reset_after_fork)
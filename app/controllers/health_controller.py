@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify
 import logging
-from ..config.db_connection import DBConnection
+from ..config.db_connection import DBConnection, ConnectionPoolTimeout
+from constants import HEALTH_CHECK_CHECKOUT_TIMEOUT
 
 # Initialize logger
 logger = logging.getLogger(__name__)
@@ -11,21 +12,28 @@ health_controller = Blueprint('health_controller', __name__)
 @health_controller.route('/health', methods=['GET'])
 def health_check():
     try:
-        # Check PostgreSQL connection using DBConnection
-        with DBConnection.get_connection() as connection:
+        # Check PostgreSQL connection using a pooled connection
+        with DBConnection.connection(timeout=HEALTH_CHECK_CHECKOUT_TIMEOUT) as connection:
             with connection.cursor() as cursor:  # Create a cursor
                 cursor.execute("SELECT 1")  # Use the cursor to execute the query
                 result = cursor.fetchone()  # Fetch the result
-                if result and result[0] == 1:
-                    logger.info("PostgreSQL connection is healthy.")
-                    return jsonify({"status": "True", "postgresDB": {"status": "Connected"}}), 200
-                else:
-                    raise Exception("Invalid response from database")
+        if result and result[0] == 1:
+            logger.info("PostgreSQL connection is healthy.")
+            return jsonify({"status": "True", "postgresDB": {"status": "Connected", "pool": DBConnection.stats()}}), 200
+        else:
+            raise Exception("Invalid response from database")
+    except ConnectionPoolTimeout as e:
+        # Postgres may be fine, all pooled connections are serving reports
+        logger.warning(f"Health check found no free database connection: {e}")
+        return jsonify({
+            "status": "False",
+            "postgresDB": {"status": "busy", "pool": DBConnection.stats()}
+        }), 503
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         return jsonify({
             "status": "False",
-            "postgresDB": {"status": "down"}
+            "postgresDB": {"status": "down", "pool": DBConnection.stats()}
         }), 500
 
 @health_controller.route('/liveness', methods=['GET'])
@@ -0,0 +1,9 @@
+from flask import Blueprint, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+from app.utils.metrics import render_latest
+
+metrics_controller = Blueprint('metrics_controller', __name__)
+
+@metrics_controller.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_latest(), content_type=CONTENT_TYPE_LATEST)
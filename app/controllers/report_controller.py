@@ -1,11 +1,16 @@
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify, Response, stream_with_context, send_file, url_for, g
 from app.services.report_service import ReportService
-from datetime import datetime, time
+from app.services.report_job_service import ReportJobService
+from app.config.db_connection import ConnectionPoolTimeout
+from app.controllers.report_request import ReportRequestError, authorize_org, parse_date_range, resolve_columns
+from app.services.admission import AdmissionController, AdmissionRejected
+from app.utils.stream_encryption import encrypt_stream, decode_key
+from app.utils.compression import available_encodings
+from app.utils.request_profile import RequestProfile, profile_stage, profile_count
+from app.utils.metrics import REPORTS_IN_FLIGHT, ReportObservation, count_report_bytes
 import logging
-import io
-import time as time_module  # To avoid conflict with datetime.time
-from app.authentication.AccessTokenValidator import AccessTokenValidator
-from constants import X_AUTHENTICATED_USER_TOKEN, IS_VALIDATION_ENABLED, REQUIRED_COLUMNS_FOR_ENROLLMENTS
+import time as time_module
+from constants import X_AUTHENTICATED_USER_TOKEN, REPORT_ENCRYPTION_KEY, REPORT_PROFILE_SERVER_TIMING
 
 # Configure logger
 logging.basicConfig(level=logging.INFO)
@@ -13,62 +18,94 @@ logger = logging.getLogger(__name__)
 
 report_controller = Blueprint('report_controller', __name__)
 
+# format -> (mimetype, file extension)
+REPORT_FORMATS = {
+    'csv': ("text/csv", "csv"),
+    'parquet': ("application/vnd.apache.parquet", "parquet"),
+    'arrow': ("application/vnd.apache.arrow.stream", "arrows")
+}
+
+JOB_RESPONSE_FIELDS = ("job_id", "org_id", "status", "start_date", "end_date", "created_at", "size_bytes", "error")
+
 @report_controller.route('/report/org/<org_id>', methods=['POST'])
 def get_report(org_id):
     start_timer = time_module.time()
+    g.report_observation = ReportObservation.start()
+    g.request_profile = RequestProfile.start("report", org_id=org_id)
+    g.report_in_flight = True
+    REPORTS_IN_FLIGHT.inc()
     try:
         logger.info(f"Received request to generate report for org_id={org_id}")
-        if IS_VALIDATION_ENABLED.lower() == 'true':
-            # Extract and validate user token
-            user_token = request.headers.get(X_AUTHENTICATED_USER_TOKEN)
-            if not user_token:
-                logger.error("Missing 'x-authenticated-user-token' in headers.")
-                return jsonify({'error': 'Authentication token is required.'}), 401
-            
-            user_org_id = AccessTokenValidator.verify_user_token_get_org(user_token, True)
-            if not user_org_id:
-                logger.error("Invalid or expired authentication token.")
-                return jsonify({'error': 'Invalid or expired authentication token.'}), 401
-
-            logger.info(f"Authenticated user with user_org_id={user_org_id}")
-            if user_org_id != org_id:
-                logger.error(f"User does not have access to organization ID {org_id}.")
-                return jsonify({'error': f'Access denied for the specified organization ID {org_id}.'}), 403
-
-        # Parse and validate date range
+        with profile_stage("auth"):
+            auth_error = _authorize_org(org_id)
+        if auth_error:
+            return auth_error
+
+        # Parse and validate date range and columns
         data = request.get_json()
-        if not data or 'start_date' not in data or 'end_date' not in data:
-            raise KeyError("Missing 'start_date' or 'end_date' in request body.")
+        start_date, end_date = parse_date_range(data)
+        logger.info(f"Generating report for org_id={org_id} from {start_date} to {end_date}")
+        required_columns = resolve_columns(data)
 
-        start_date = datetime.strptime(data['start_date'], '%Y-%m-%d')
-        end_date = datetime.strptime(data['end_date'], '%Y-%m-%d')
+        output_format = str(request.args.get('format', data.get('format', 'csv'))).lower()
+        if output_format not in REPORT_FORMATS:
+            logger.warning(f"Invalid report format requested: {output_format}")
+            return jsonify({'error': f"Invalid format. Use one of: {', '.join(REPORT_FORMATS)}."}), 400
 
-        start_date = datetime.combine(start_date.date(), time.min)  # 00:00:00
-        end_date = datetime.combine(end_date.date(), time.max)      # 23:59:59.999999
+        encrypt = str(request.args.get('encrypt', data.get('encrypt', 'false'))).lower() == 'true'
+        if encrypt and not REPORT_ENCRYPTION_KEY:
+            logger.warning(f"Encrypted report requested for org_id={org_id} but REPORT_ENCRYPTION_KEY is not set.")
+            return jsonify({'error': 'Encrypted reports are not enabled on this server.'}), 501
+        encryption_key = None
+        if encrypt:
+            try:
+                encryption_key = decode_key(REPORT_ENCRYPTION_KEY)
+            except Exception as e:
+                logger.error(f"Invalid REPORT_ENCRYPTION_KEY: {e}")
+                return jsonify({'error': 'Report encryption is misconfigured on this server.'}), 500
 
-        logger.info(f"Generating report for org_id={org_id} from {start_date} to {end_date}")
-         #Validate date range
-        if (end_date - start_date).days > 365:
-            logger.warning(f"Date range exceeds 1 year: start_date={start_date}, end_date={end_date}")
-            return jsonify({'error': 'Date range cannot exceed 1 year'}), 400
+        if str(request.args.get('async', data.get('async', 'false'))).lower() == 'true':
+            if encrypt or output_format != 'csv':
+                return jsonify({'error': 'Encrypted and non-CSV reports are only available for synchronous requests.'}), 400
+            job = ReportJobService.submit_job(
+                org_id, start_date, end_date, required_columns=required_columns
+            )
+            return jsonify(_job_response(job)), 202
+
+        try:
+            with profile_stage("admission"):
+                # Held until the teardown hook, which runs once the last chunk has been sent
+                g.report_admission = AdmissionController.admit(org_id)
+        except AdmissionRejected as e:
+            error_message = str(e)
+            logger.warning(f"Report request for org_id={org_id} rejected: {error_message}")
+            return (
+                jsonify({'error': 'Too many reports are being generated. Please try again later.', 'details': error_message}),
+                429,
+                {"Retry-After": str(e.retry_after)}
+            )
+
+        # Encrypted output and Parquet (compressed internally) are sent as is
+        encoding = None
+        if not encryption_key and output_format != 'parquet':
+            encoding = request.accept_encodings.best_match(available_encodings())
 
         try:
-        
-            csv_data = ReportService.get_total_learning_hours_csv_stream(
-                start_date, end_date, org_id, required_columns=REQUIRED_COLUMNS_FOR_ENROLLMENTS
+            report_chunks = ReportService.stream_total_learning_hours_report(
+                start_date, end_date, org_id, required_columns=required_columns,
+                output_format=output_format, encoding=encoding
             )
 
-            if not csv_data:
+            # Pull the first chunk eagerly so empty reports and early failures still get a proper status code
+            first_chunk = next(report_chunks, None)
+            if first_chunk is None:
                 logger.warning(f"No data found for org_id={org_id} within given date range.")
                 return jsonify({'error': 'No data found for the given organization ID.'}), 404
 
-            # Convert CSV data to BytesIO
-            if isinstance(csv_data, str):
-                csv_data = csv_data.encode('utf-8')
-
-            csv_stream = io.BytesIO()
-            csv_stream.write(csv_data)
-            csv_stream.seek(0)
+        except ConnectionPoolTimeout as e:
+            error_message = str(e)
+            logger.error(f"No database connection available for org_id={org_id}: {error_message}")
+            return jsonify({'error': 'The service is busy. Please try again later.', 'details': error_message}), 503
 
         except Exception as e:
             error_message = str(e)
@@ -76,16 +113,35 @@ def get_report(org_id):
             return jsonify({'error': 'Failed to generate the report due to an internal error.', 'details': error_message}), 500
 
         time_taken = round(time_module.time() - start_timer, 2)
-        logger.info(f"Report generated successfully for org_id={org_id} in {time_taken} seconds")
+        logger.info(f"Report streaming started for org_id={org_id} after {time_taken} seconds")
+
+        mimetype, extension = REPORT_FORMATS[output_format]
+        report_body = _stream_report(org_id, first_chunk, report_chunks, start_timer)
+        if encryption_key:
+            # Rows are encrypted segment by segment as they are produced
+            return Response(
+                stream_with_context(encrypt_stream(report_body, encryption_key)),
+                mimetype="application/octet-stream",
+                headers={
+                    "Content-Disposition": f'attachment; filename="report_{org_id}.{extension}.enc"'
+                }
+            )
 
+        headers = {
+            "Content-Disposition": f'attachment; filename="report_{org_id}.{extension}"',
+            "Vary": "Accept-Encoding"
+        }
+        if encoding:
+            headers["Content-Encoding"] = encoding
         return Response(
-            csv_stream.getvalue(),
-            mimetype="text/csv",
-            headers={
-                "Content-Disposition": f'attachment; filename="report_{org_id}.csv"'
-            }
+            stream_with_context(report_body),
+            mimetype=mimetype,
+            headers=headers
         )
 
+    except ReportRequestError as e:
+        return jsonify(e.body), e.status
+
     except KeyError as e:
         error_message = str(e)
         logger.error(f"Missing required fields in request: {error_message}")
@@ -105,3 +161,111 @@ def get_report(org_id):
         error_message = str(e)
         logger.exception(f"Unexpected error occurred: {error_message}")
         return jsonify({'error': 'An unexpected error occurred. Please try again later.', 'details': error_message}), 500
+
+
+@report_controller.route('/report/org/<org_id>/jobs/<job_id>', methods=['GET'])
+def get_report_job(org_id, job_id):
+    auth_error = _authorize_org(org_id)
+    if auth_error:
+        return auth_error
+
+    job = ReportJobService.get_job(job_id)
+    if not job or job["org_id"] != org_id:
+        return jsonify({'error': f'Report job {job_id} not found.'}), 404
+    return jsonify(_job_response(job)), 200
+
+
+@report_controller.route('/report/org/<org_id>/jobs/<job_id>/download', methods=['GET'])
+def download_report_job(org_id, job_id):
+    auth_error = _authorize_org(org_id)
+    if auth_error:
+        return auth_error
+
+    job = ReportJobService.get_job(job_id)
+    if not job or job["org_id"] != org_id:
+        return jsonify({'error': f'Report job {job_id} not found.'}), 404
+    if job["status"] == "empty":
+        return jsonify({'error': 'No data found for the given organization ID.'}), 404
+    if job["status"] == "failed":
+        return jsonify({'error': 'Failed to generate the report due to an internal error.', 'details': job["error"]}), 500
+    if job["status"] != "completed":
+        return jsonify(_job_response(job)), 409
+
+    return send_file(
+        ReportJobService.get_result_path(job_id),
+        mimetype="text/csv",
+        as_attachment=True,
+        download_name=f"report_{org_id}.csv"
+    )
+
+
+@report_controller.after_request
+def _add_server_timing(response):
+    observation = g.get("report_observation")
+    if observation:
+        observation.status = response.status_code
+    profile = g.get("request_profile")
+    if profile:
+        profile.tags["status"] = response.status_code
+        if REPORT_PROFILE_SERVER_TIMING.lower() == 'true':
+            # Sent with the headers, so it covers the work done until the first chunk
+            response.headers["Server-Timing"] = profile.server_timing()
+    return response
+
+
+@report_controller.teardown_request
+def _finish_report_request(error=None):
+    # Streamed responses keep the request context until the last chunk is sent
+    admission = g.pop("report_admission", None)
+    if admission:
+        admission.release()
+    if g.pop("report_in_flight", False):
+        REPORTS_IN_FLIGHT.dec()
+    stages = None
+    profile = g.pop("request_profile", None)
+    if profile:
+        record = profile.finish(error=str(error) if error else None)
+        if record:
+            stages = record["stages"]
+    observation = g.pop("report_observation", None)
+    if observation:
+        observation.finish(stages)
+
+
+def _authorize_org(org_id):
+    """
+    Returns an error response when the caller may not access org_id, None otherwise.
+    """
+    try:
+        authorize_org(org_id, request.headers.get(X_AUTHENTICATED_USER_TOKEN))
+    except ReportRequestError as e:
+        return jsonify(e.body), e.status
+    return None
+
+
+def _job_response(job):
+    # owner_pid and updated_at are bookkeeping of the workers, not part of the API
+    response = {field: job.get(field) for field in JOB_RESPONSE_FIELDS}
+    response["status_url"] = url_for('report_controller.get_report_job', org_id=job["org_id"], job_id=job["job_id"])
+    response["download_url"] = url_for('report_controller.download_report_job', org_id=job["org_id"], job_id=job["job_id"])
+    return response
+
+
+def _stream_report(org_id, first_chunk, chunks, start_timer):
+    try:
+        chunk = first_chunk
+        while chunk is not None:
+            profile_count("bytes_produced", len(chunk))
+            count_report_bytes(len(chunk))
+            # Time the server spends handing the chunk to the client
+            with profile_stage("response"):
+                yield chunk
+            chunk = next(chunks, None)
+        time_taken = round(time_module.time() - start_timer, 2)
+        logger.info(f"Report generated successfully for org_id={org_id} in {time_taken} seconds")
+    except Exception as e:
+        # Headers are already sent, abort the chunked body so the client sees a truncated transfer
+        logger.exception(f"Error while streaming report for org_id={org_id}: {e}")
+        raise
+    finally:
+        chunks.close()
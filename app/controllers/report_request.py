@@ -0,0 +1,79 @@
+import logging
+from datetime import datetime, time
+from app.authentication.AccessTokenValidator import AccessTokenValidator
+from app.services.report_query import ReportQueryBuilder
+from constants import IS_VALIDATION_ENABLED, REQUIRED_COLUMNS_FOR_ENROLLMENTS
+
+logger = logging.getLogger(__name__)
+
+
+class ReportRequestError(Exception):
+    """
+    A report request that must be answered with status and the JSON body.
+    """
+    def __init__(self, body, status):
+        super().__init__(body['error'])
+        self.body = body
+        self.status = status
+
+
+def authorize_org(org_id, user_token):
+    """
+    Raises ReportRequestError when the holder of user_token may not access org_id.
+    Verifying a token that is not cached yet costs an RSA signature check.
+    """
+    if IS_VALIDATION_ENABLED.lower() != 'true':
+        return
+
+    if not user_token:
+        logger.error("Missing 'x-authenticated-user-token' in headers.")
+        raise ReportRequestError({'error': 'Authentication token is required.'}, 401)
+
+    user_org_id = AccessTokenValidator.verify_user_token_get_org(user_token, True)
+    if not user_org_id:
+        logger.error("Invalid or expired authentication token.")
+        raise ReportRequestError({'error': 'Invalid or expired authentication token.'}, 401)
+
+    logger.info(f"Authenticated user with user_org_id={user_org_id}")
+    if user_org_id != org_id:
+        logger.error(f"User does not have access to organization ID {org_id}.")
+        raise ReportRequestError({'error': f'Access denied for the specified organization ID {org_id}.'}, 403)
+
+
+def parse_date_range(data):
+    """
+    Returns the (start_date, end_date) of the request body, spanning whole days.
+    Raises KeyError when a date is missing, ValueError when one is malformed
+    and ReportRequestError when the range exceeds a year.
+    """
+    if not data or 'start_date' not in data or 'end_date' not in data:
+        raise KeyError("Missing 'start_date' or 'end_date' in request body.")
+
+    start_date = datetime.strptime(data['start_date'], '%Y-%m-%d')
+    end_date = datetime.strptime(data['end_date'], '%Y-%m-%d')
+
+    start_date = datetime.combine(start_date.date(), time.min)  # 00:00:00
+    end_date = datetime.combine(end_date.date(), time.max)      # 23:59:59.999999
+
+    if (end_date - start_date).days > 365:
+        logger.warning(f"Date range exceeds 1 year: start_date={start_date}, end_date={end_date}")
+        raise ReportRequestError({'error': 'Date range cannot exceed 1 year'}, 400)
+    return start_date, end_date
+
+
+def resolve_columns(data):
+    """
+    Returns the report columns requested in the body, or the default ones.
+    Raises ReportRequestError when they are not a list of known column names.
+    """
+    # Optional per-request column selection, resolved to per-table SQL projections by the service
+    required_columns = data.get('columns') or REQUIRED_COLUMNS_FOR_ENROLLMENTS
+    available_columns = ReportQueryBuilder.merged_columns()
+    if (not isinstance(required_columns, list)
+            or not all(isinstance(col, str) for col in required_columns)
+            or not set(required_columns) & set(available_columns)):
+        logger.warning(f"Invalid report columns requested: {required_columns}")
+        raise ReportRequestError(
+            {'error': 'Invalid columns. Provide a list of report column names.', 'available_columns': available_columns}, 400
+        )
+    return required_columns
@@ -0,0 +1,139 @@
+import os
+import time
+import fcntl
+import random
+import hashlib
+import logging
+from app.utils.metrics import REPORT_ADMISSIONS
+from constants import (
+    REPORT_ADMISSION_DIR, REPORT_MAX_IN_FLIGHT, REPORT_MAX_IN_FLIGHT_PER_ORG,
+    REPORT_ADMISSION_QUEUE_SIZE, REPORT_ADMISSION_WAIT_SECONDS, REPORT_ADMISSION_RETRY_AFTER_SECONDS
+)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounds the reports generated at the same time, in total and per org,
+    across all worker processes of the pod.
+
+    Every in-flight report holds an flock on one slot file out of
+    REPORT_MAX_IN_FLIGHT global and REPORT_MAX_IN_FLIGHT_PER_ORG per-org
+    slot files. The kernel drops the locks of a worker that dies, so slots
+    never leak. A request whose org is at its limit is rejected right away.
+    One that only finds the global slots taken waits, holding its org slot,
+    in a queue that is bounded the same way, and is rejected when the queue
+    is full or after REPORT_ADMISSION_WAIT_SECONDS. Waiters poll, so they
+    are not served in arrival order.
+    """
+    logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def admit(org_id):
+        """
+        Returns an admission to release once the report has been sent.
+        Raises AdmissionRejected when the report may not run now.
+        """
+        if REPORT_MAX_IN_FLIGHT <= 0 and REPORT_MAX_IN_FLIGHT_PER_ORG <= 0:
+            return _Admission([])
+        os.makedirs(REPORT_ADMISSION_DIR, exist_ok=True)
+
+        slots = []
+        if REPORT_MAX_IN_FLIGHT_PER_ORG > 0:
+            # Hashed, org ids are not necessarily safe file names
+            org_key = hashlib.sha1(str(org_id).encode("utf-8")).hexdigest()[:16]
+            org_slot = _acquire_slot(f"org-{org_key}", REPORT_MAX_IN_FLIGHT_PER_ORG)
+            if org_slot is None:
+                # Never queued, an org over its own limit must not take the wait queue from other orgs
+                REPORT_ADMISSIONS.labels(result="rejected").inc()
+                raise AdmissionRejected(
+                    f"This organization already has {REPORT_MAX_IN_FLIGHT_PER_ORG} reports in progress.",
+                    REPORT_ADMISSION_RETRY_AFTER_SECONDS
+                )
+            slots.append(org_slot)
+
+        try:
+            global_slot = AdmissionController._acquire_global_slot(org_id)
+        except BaseException:
+            _Admission(slots).release()
+            raise
+        if global_slot is not None:
+            slots.append(global_slot)
+        return _Admission(slots)
+
+    @staticmethod
+    def _acquire_global_slot(org_id):
+        """
+        Returns the file descriptor of a global slot (None without a global
+        limit), waiting in the queue while all are taken.
+        """
+        if REPORT_MAX_IN_FLIGHT <= 0:
+            REPORT_ADMISSIONS.labels(result="admitted").inc()
+            return None
+        global_slot = _acquire_slot("global", REPORT_MAX_IN_FLIGHT)
+        if global_slot is not None:
+            REPORT_ADMISSIONS.labels(result="admitted").inc()
+            return global_slot
+
+        queue_slot = _acquire_slot("queue", REPORT_ADMISSION_QUEUE_SIZE)
+        if queue_slot is None:
+            REPORT_ADMISSIONS.labels(result="rejected").inc()
+            raise AdmissionRejected("Too many reports are being generated and the wait queue is full.", REPORT_ADMISSION_RETRY_AFTER_SECONDS)
+
+        AdmissionController.logger.info(f"Report for org_id={org_id} is waiting for a free slot.")
+        try:
+            deadline = time.monotonic() + REPORT_ADMISSION_WAIT_SECONDS
+            delay = 0.05
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                time.sleep(min(delay, remaining))
+                global_slot = _acquire_slot("global", REPORT_MAX_IN_FLIGHT)
+                if global_slot is not None:
+                    REPORT_ADMISSIONS.labels(result="queued").inc()
+                    return global_slot
+                delay = min(delay * 2, 0.5)
+        finally:
+            os.close(queue_slot)
+
+        REPORT_ADMISSIONS.labels(result="rejected").inc()
+        raise AdmissionRejected(
+            f"No report slot became free within {REPORT_ADMISSION_WAIT_SECONDS} seconds.", REPORT_ADMISSION_RETRY_AFTER_SECONDS
+        )
+
+
+def _acquire_slot(name, count):
+    """
+    Locks the first free one of count slot files and returns its file descriptor, or None.
+    """
+    # Start at a random slot so concurrent callers do not all contend for slot 0
+    offset = random.randrange(count) if count > 0 else 0
+    for i in range(count):
+        path = os.path.join(REPORT_ADMISSION_DIR, f"{name}-{(offset + i) % count}.lock")
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # Locks belong to the open file, so threads of one worker exclude each other as well
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except BlockingIOError:
+            os.close(fd)
+        except Exception:
+            os.close(fd)
+            raise
+    return None
+
+
+class _Admission:
+    def __init__(self, slots):
+        self.slots = slots
+
+    def release(self):
+        # Closing the descriptor drops its lock
+        while self.slots:
+            os.close(self.slots.pop())
@@ -0,0 +1,137 @@
+import logging
+import threading
+import time
+from app.services.fetch_data import DataFetcher
+from app.services.report_query import ReportQueryBuilder
+from constants import (
+    CONTENT_TABLE, CONTENT_CACHE_TTL_SECONDS, CONTENT_CACHE_WATERMARK_COLUMN, CONTENT_CACHE_MAX_AGE_SECONDS
+)
+
+
+class ContentCache:
+    """
+    Per-process cache of the content dimension table, indexed by content_id.
+
+    Within CONTENT_CACHE_TTL_SECONDS the cached frame is served as is. After
+    that a cheap probe (row count and, if configured, the max of
+    CONTENT_CACHE_WATERMARK_COLUMN) decides whether the catalog changed and
+    needs to be reloaded. Without a watermark column the probe only sees rows
+    being added or removed, so the catalog is also reloaded once it is
+    CONTENT_CACHE_MAX_AGE_SECONDS old. The cached frame is shared and must
+    not be mutated.
+
+    While the cache is cold, callers that know which content_ids they need
+    can fetch just those rows with fetch_referenced() and warm the cache in
+    the background with warm_in_background().
+    """
+    logger = logging.getLogger(__name__)
+    _lock = threading.Lock()
+    _content_df = None
+    _watermark = None
+    _checked_at = 0.0
+    _loaded_at = 0.0
+    _warmer = None
+
+    @staticmethod
+    def get_content_frame(fetcher):
+        """
+        Returns the content frame indexed by content_id.
+        """
+        if CONTENT_CACHE_TTL_SECONDS <= 0:
+            content_df, _ = ContentCache._load(fetcher)
+            return content_df
+
+        with ContentCache._lock:
+            now = time.monotonic()
+            if ContentCache._content_df is not None:
+                if now - ContentCache._checked_at < CONTENT_CACHE_TTL_SECONDS:
+                    return ContentCache._content_df
+
+                if now - ContentCache._loaded_at >= CONTENT_CACHE_MAX_AGE_SECONDS:
+                    ContentCache.logger.info("Content cache reached its maximum age, reloading")
+                    watermark = None
+                else:
+                    watermark = ContentCache._probe(fetcher)
+                if watermark is not None and watermark == ContentCache._watermark:
+                    ContentCache.logger.info(f"Content cache still fresh, watermark={watermark}")
+                    ContentCache._checked_at = now
+                    return ContentCache._content_df
+
+            content_df, watermark = ContentCache._load(fetcher)
+            if content_df.empty:
+                return content_df
+
+            ContentCache._content_df = content_df
+            ContentCache._watermark = watermark
+            ContentCache._checked_at = now
+            ContentCache._loaded_at = now
+            return content_df
+
+    @staticmethod
+    def is_warm():
+        return CONTENT_CACHE_TTL_SECONDS > 0 and ContentCache._content_df is not None
+
+    @staticmethod
+    def warm_in_background():
+        """
+        Loads the catalog into the cache on a background thread with its own
+        connection, unless it is warm or already being loaded.
+        """
+        if CONTENT_CACHE_TTL_SECONDS <= 0 or ContentCache.is_warm():
+            return
+        with ContentCache._lock:
+            if ContentCache._warmer is not None and ContentCache._warmer.is_alive():
+                return
+            ContentCache._warmer = threading.Thread(target=ContentCache._warm, name="content-cache-warmer", daemon=True)
+            ContentCache._warmer.start()
+
+    @staticmethod
+    def _warm():
+        try:
+            with DataFetcher() as fetcher:
+                ContentCache.get_content_frame(fetcher)
+        except Exception as e:
+            ContentCache.logger.error(f"Error warming the content cache: {e}")
+
+    @staticmethod
+    def _load(fetcher):
+        # Probe before loading so the stored watermark never runs ahead of the data
+        watermark = ContentCache._probe(fetcher)
+        content_df = fetcher.fetch_data_as_dataframe(
+            CONTENT_TABLE,
+            columns=ReportQueryBuilder.CONTENT_COLUMNS
+        )
+        if content_df.empty:
+            return content_df, None
+
+        content_df = content_df.set_index("content_id")
+        ContentCache.logger.info(f"Content cache loaded with {len(content_df)} rows, watermark={watermark}")
+        return content_df, watermark
+
+    @staticmethod
+    def fetch_referenced(fetcher, content_ids):
+        """
+        Fetches only the given content rows, indexed by content_id, bypassing the cache.
+        """
+        content_df = fetcher.fetch_data_as_dataframe(
+            CONTENT_TABLE,
+            {"content_id__in": list(content_ids)},
+            columns=ReportQueryBuilder.CONTENT_COLUMNS
+        )
+        if content_df.empty:
+            return content_df
+
+        ContentCache.logger.info(f"Fetched {len(content_df)} of {len(content_ids)} referenced content rows, bypassing the cold cache")
+        return content_df.set_index("content_id")
+
+    @staticmethod
+    def _probe(fetcher):
+        select_clause = "count(*)"
+        if CONTENT_CACHE_WATERMARK_COLUMN:
+            select_clause += f", max({CONTENT_CACHE_WATERMARK_COLUMN})"
+        probe_df = fetcher.fetch_query_as_dataframe(
+            f"SELECT {select_clause} FROM {CONTENT_TABLE}", label=f"{CONTENT_TABLE}_watermark"
+        )
+        if probe_df.empty:
+            return None
+        return tuple(probe_df.iloc[0])
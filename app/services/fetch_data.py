@@ -1,9 +1,67 @@
 import pandas as pd
 from io import BytesIO
+import uuid
+import queue
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from psycopg2 import extensions
 from ..config.db_connection import DBConnection
+from ..utils.request_profile import profile_stage, profile_count, profile_query
+from ..utils.metrics import observe_query
+from constants import (
+    DB_CURSOR_ITERSIZE, DB_COPY_CHUNK_BYTES, DB_FETCH_STRATEGY,
+    DB_IN_FILTER_ARRAY_THRESHOLD, DB_IN_FILTER_TEMP_TABLE_THRESHOLD
+)
 import logging 
 import time  # Add this import
 
+try:
+    import pyarrow  # Optional, speeds up the columnar fetch path
+    import pyarrow.csv
+except ImportError:
+    pyarrow = None
+
+# Postgres type OIDs -> pandas dtypes used by the columnar fetch path, anything else is read as text
+PG_COLUMN_DTYPES = {
+    16: "boolean",  # bool
+    20: "Int64",  # int8
+    21: "Int64",  # int2
+    23: "Int64",  # int4
+    700: "float64",  # float4
+    701: "float64",  # float8
+    1700: "float64",  # numeric
+}
+PG_ARROW_TYPES = {} if pyarrow is None else {
+    16: pyarrow.bool_(),
+    20: pyarrow.int64(),
+    21: pyarrow.int64(),
+    23: pyarrow.int64(),
+    700: pyarrow.float64(),
+    701: pyarrow.float64(),
+    1700: pyarrow.float64(),
+}
+PG_TIMESTAMPTZ = 1184
+PG_DATE_TYPES = {1082, 1114, PG_TIMESTAMPTZ}  # date, timestamp, timestamptz
+COPY_TEXT_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _copy_text_value(value):
+    # COPY text format: \N is NULL, backslash and the delimiters are escaped
+    if value is None:
+        return "\\N"
+    return str(value).translate(COPY_TEXT_ESCAPES)
+
+
+def _array_literal(values):
+    # Postgres array input syntax, every element quoted so commas and braces need no special care
+    elements = (
+        "NULL" if value is None else '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+        for value in values
+    )
+    return "{" + ",".join(elements) + "}"
+
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -11,9 +69,50 @@ logging.basicConfig(
 )
 class DataFetcher:
     logger = logging.getLogger(__name__)
-    def __init__(self):# Class-level shared connection
-        # Initialize a shared database connection
+    _column_types = {}  # (table, column) -> SQL type name, shared by all fetchers of the process
+
+    def __init__(self):
+        # Check a connection out of the pool, it is returned by close()
         self.connection = DBConnection.get_connection()
+        self.snapshot_id = None
+
+    def export_snapshot(self):
+        """
+        Starts a REPEATABLE READ transaction and exports its snapshot, which
+        stays importable by other connections until this fetcher is closed.
+        """
+        self._begin_repeatable_read()
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT pg_export_snapshot()")
+        self.snapshot_id = cursor.fetchone()[0]
+        cursor.close()
+        return self.snapshot_id
+
+    def import_snapshot(self, snapshot_id):
+        """
+        Starts a REPEATABLE READ transaction that sees exactly the snapshot
+        exported by another connection.
+        """
+        self._begin_repeatable_read()
+        cursor = self.connection.cursor()
+        cursor.execute("SET TRANSACTION SNAPSHOT %s", (snapshot_id,))
+        cursor.close()
+        self.snapshot_id = snapshot_id
+
+    def _begin_repeatable_read(self):
+        # SET TRANSACTION must be the first statement of the transaction
+        if self.connection.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            self.connection.rollback()
+        self.snapshot_id = None
+        cursor = self.connection.cursor()
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def fetch_data_as_map(self, table_name):
         try:
@@ -86,54 +185,431 @@ class DataFetcher:
 
     def fetch_data_as_dataframe(self, table_name, filters=None, columns=None):
         try:
-            start_time = time.time()
-            DataFetcher.logger.info(f"[{table_name}] - Fetching  records.")
+            query, values = self._build_select_query(table_name, filters, columns)
+            return self._execute_as_dataframe(query, values, table_name)
+        except Exception as e:
+            DataFetcher.logger.error(f"Error fetching data from {table_name}: {e}")
+            return pd.DataFrame()
 
-            cursor = self.connection.cursor()
-            col_clause = ", ".join(columns) if columns else "*"
-            query = f"SELECT {col_clause} FROM {table_name}"
-            values = []
-
-            if filters:
-                conditions = []
-                for key, value in filters.items():
-                    if "__" in key:
-                        col, op = key.split("__")
-                        if op == "in" and isinstance(value, list):
-                            placeholders = ','.join(['%s'] * len(value))
-                            conditions.append(f"{col} IN ({placeholders})")
-                            values.extend(value)
-                        elif op == "gte":
-                            conditions.append(f"{col} >= %s")
-                            values.append(value)
-                        elif op == "lte":
-                            conditions.append(f"{col} <= %s")
-                            values.append(value)
-                        # Add other operations if needed
-                    else:
-                        conditions.append(f"{key} = %s")
-                        values.append(value)
+    def fetch_query_as_dataframe(self, query, values=None, label="query", strategy=None):
+        try:
+            return self._execute_as_dataframe(query, values or [], label, strategy)
+        except Exception as e:
+            DataFetcher.logger.error(f"Error fetching data for {label}: {e}")
+            return pd.DataFrame()
 
-                query += " WHERE " + " AND ".join(conditions)
+    def fetch_data_as_dataframe_chunks(self, table_name, filters=None, columns=None, chunk_size=None):
+        """
+        Yields the rows of table_name as DataFrame chunks of at most chunk_size rows,
+        using a server-side cursor so the full result set is never held in memory.
+        chunk_size may also be a callable returning the size of the next chunk.
+        """
+        query, values = self._build_select_query(table_name, filters, columns)
+        return self._iter_dataframe_chunks(query, values, table_name, chunk_size)
 
-            cursor.execute(query, values)
-            rows = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
+    def fetch_query_as_dataframe_chunks(self, query, values=None, label="query", chunk_size=None):
+        """
+        Yields the result of query as DataFrame chunks of at most chunk_size rows,
+        using a server-side cursor so the full result set is never held in memory.
+        """
+        return self._iter_dataframe_chunks(query, values or [], label, chunk_size)
 
-            df = pd.DataFrame(rows, columns=columns)
+    def _iter_dataframe_chunks(self, query, values, label, chunk_size=None):
+        # chunk_size may be a callable, asked again before every chunk
+        next_chunk_size = chunk_size if callable(chunk_size) else lambda: chunk_size or DB_CURSOR_ITERSIZE
+        start_time = time.time()
+        total_rows = 0
+        DataFetcher.logger.info(f"[{label}] - Streaming records in chunks of {next_chunk_size()}.")
 
-            elapsed_time = time.time() - start_time 
-            DataFetcher.logger.info(f"[{table_name}] - Records fetched: {len(df)} | Time taken: {elapsed_time:.2f} seconds")
-            return df
+        # Named cursors are declared server-side, rows are pulled with FETCH on demand
+        cursor = self.connection.cursor(name=f"report_{uuid.uuid4().hex}")
+        cursor.itersize = next_chunk_size()
+        try:
+            with profile_stage("db"):
+                cursor.execute(query, values)
+            while True:
+                with profile_stage("db"):
+                    rows = cursor.fetchmany(next_chunk_size())
+                if not rows:
+                    break
+                columns = [desc[0] for desc in cursor.description]
+                total_rows += len(rows)
+                profile_count("rows_fetched", len(rows))
+                with profile_stage("dataframe"):
+                    chunk_df = pd.DataFrame(rows, columns=columns)
+                yield chunk_df
         except Exception as e:
-            DataFetcher.logger.error(f"Error fetching data from {table_name}: {e}")
-            return pd.DataFrame()
+            DataFetcher.logger.error(f"Error streaming data for {label}: {e}")
+            raise
+        finally:
+            cursor.close()
+            elapsed_time = time.time() - start_time
+            DataFetcher.logger.info(f"[{label}] - Records streamed: {total_rows} | Time taken: {elapsed_time:.2f} seconds")
+            DataFetcher._record_query(label, elapsed_time, total_rows)
+
+    def fetch_date_partitioned_dataframe(self, query, values, date_column, start_date, end_date, partitions, label="query"):
+        """
+        Splits [start_date, end_date] into equal sub-ranges of date_column and
+        fetches them in parallel, each on its own pooled connection. All
+        partitions read the snapshot this fetcher exported (or imported), so
+        the result is consistent. Returns the rows in date_column order.
+
+        The number of partitions is capped by the connections the pool can
+        hand out right now, with a single one the query runs on this
+        fetcher's connection. Database errors, ConnectionPoolTimeout
+        included, are raised to the caller.
+        """
+        start_time = time.time()
+        available = DBConnection.available_connections()
+        if partitions > available:
+            DataFetcher.logger.warning(
+                f"[{label}] - Only {available} pooled connections free, scanning {max(available, 1)} partitions instead of {partitions}."
+            )
+            partitions = max(available, 1)
+        if partitions <= 1:
+            return self._execute_as_dataframe(query, values, label)
+
+        try:
+            snapshot_id = self.snapshot_id or self.export_snapshot()
+
+            step = (end_date - start_date) / partitions
+            bounds = [start_date + step * i for i in range(partitions)] + [end_date]
+            partition_queries = []
+            for i in range(partitions):
+                # Half-open sub-ranges, only the last one includes end_date
+                upper_op = "<=" if i == partitions - 1 else "<"
+                partition_queries.append((
+                    f"SELECT * FROM ({query}) AS part "
+                    f"WHERE part.{date_column} >= %s AND part.{date_column} {upper_op} %s "
+                    f"ORDER BY part.{date_column}",
+                    list(values) + [bounds[i], bounds[i + 1]],
+                    f"{label}[{i + 1}/{partitions}]"
+                ))
+
+            with ThreadPoolExecutor(max_workers=partitions, thread_name_prefix="partition-fetch") as executor:
+                # Each partition runs in a copy of the caller's context, so it records into the same request profile
+                futures = [
+                    executor.submit(contextvars.copy_context().run, DataFetcher._fetch_partition, snapshot_id, *partition)
+                    for partition in partition_queries
+                ]
+                frames = [future.result() for future in futures]
+        except Exception as e:
+            DataFetcher.logger.error(f"Error fetching partitioned data for {label}: {e}")
+            raise
+
+        df = pd.concat(frames, ignore_index=True)
+        elapsed_time = time.time() - start_time
+        DataFetcher.logger.info(f"[{label}] - Records fetched over {partitions} partitions: {len(df)} | Time taken: {elapsed_time:.2f} seconds")
+        return df
+
+    @staticmethod
+    def _fetch_partition(snapshot_id, query, values, label):
+        with DataFetcher() as fetcher:
+            fetcher.import_snapshot(snapshot_id)
+            return fetcher._execute_as_dataframe(query, values, label)
+
+    def stream_query_as_csv(self, query, values=None, label="query", chunk_bytes=None):
+        """
+        Yields the result of query as CSV bytes (header first) produced by
+        Postgres itself through COPY ... TO STDOUT, without building Python rows.
+        """
+        chunk_bytes = chunk_bytes or DB_COPY_CHUNK_BYTES
+        start_time = time.time()
+        total_bytes = 0
+        DataFetcher.logger.info(f"[{label}] - Streaming CSV through COPY.")
 
-    def close_connection(connection):
-        if connection:
-            connection.close()
+        cursor = self.connection.cursor()
+        # COPY does not accept bind parameters, so the statement is rendered client-side
+        encoding = extensions.encodings[self.connection.encoding]
+        copy_sql = f"COPY ({cursor.mogrify(query, values or []).decode(encoding)}) TO STDOUT WITH CSV HEADER"
+
+        # copy_expert blocks until the whole result is written, so it runs in a
+        # helper thread that hands chunks over through a bounded queue
+        chunks = queue.Queue(maxsize=4)
+        cancelled = threading.Event()
+        writer = _QueueWriter(chunks, chunk_bytes, cancelled)
+
+        def run_copy():
+            try:
+                cursor.copy_expert(copy_sql, writer)
+                writer.flush()
+                writer.put(_COPY_DONE)
+            except Exception as e:
+                writer.put(e)
+
+        copy_thread = threading.Thread(target=run_copy, name=f"copy-{label}", daemon=True)
+        copy_thread.start()
+        try:
+            while True:
+                with profile_stage("db"):
+                    item = chunks.get()
+                if item is _COPY_DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                total_bytes += len(item)
+                yield item
+        except Exception as e:
+            DataFetcher.logger.error(f"Error streaming CSV for {label}: {e}")
+            raise
+        finally:
+            if copy_thread.is_alive():
+                # The consumer stopped early, abort the COPY on the server as well
+                cancelled.set()
+                self.connection.cancel()
+            copy_thread.join()
+            cursor.close()
+            elapsed_time = time.time() - start_time
+            DataFetcher.logger.info(f"[{label}] - CSV bytes streamed: {total_bytes} | Time taken: {elapsed_time:.2f} seconds")
+            DataFetcher._record_query(label, elapsed_time, None)
+
+    def _build_select_query(self, table_name, filters=None, columns=None):
+        col_clause = ", ".join(columns) if columns else "*"
+        query = f"SELECT {col_clause} FROM {table_name}"
+        values = []
+
+        if filters:
+            conditions = []
+            for key, value in filters.items():
+                if "__" in key:
+                    col, op = key.split("__")
+                    if op == "in" and isinstance(value, list):
+                        condition, condition_values = self._build_in_condition(table_name, col, value)
+                        conditions.append(condition)
+                        values.extend(condition_values)
+                    elif op == "gte":
+                        conditions.append(f"{col} >= %s")
+                        values.append(value)
+                    elif op == "lte":
+                        conditions.append(f"{col} <= %s")
+                        values.append(value)
+                    # Add other operations if needed
+                else:
+                    conditions.append(f"{key} = %s")
+                    values.append(value)
+
+            query += " WHERE " + " AND ".join(conditions)
+
+        return query, values
+
+    def _build_in_condition(self, table_name, column, value_list):
+        """
+        Builds the condition for a column__in filter, picking the strategy by
+        list size: one placeholder per value for short lists, a single array
+        literal for longer ones and a bulk loaded temporary table for very
+        large ones.
+        """
+        if not value_list:
+            return "FALSE", []
+        if len(value_list) < DB_IN_FILTER_ARRAY_THRESHOLD:
+            placeholders = ','.join(['%s'] * len(value_list))
+            return f"{column} IN ({placeholders})", list(value_list)
+        if len(value_list) < DB_IN_FILTER_TEMP_TABLE_THRESHOLD:
+            # psycopg2 would expand a Python list into ARRAY[...] with one literal per value,
+            # a single string cast to the column's array type is parsed as one constant
+            column_type = self._get_column_type(table_name, column)
+            return f"{column} = ANY(%s::{column_type}[])", [_array_literal(value_list)]
+
+        filter_table = self._load_filter_table(table_name, column, value_list)
+        return f"{column} IN (SELECT v FROM {filter_table})", []
+
+    def _get_column_type(self, table_name, column):
+        key = (table_name, column)
+        if key not in DataFetcher._column_types:
+            cursor = self.connection.cursor()
+            try:
+                cursor.execute(
+                    "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+                    "WHERE attrelid = %s::regclass AND attname = %s AND NOT attisdropped",
+                    (table_name, column)
+                )
+                row = cursor.fetchone()
+            finally:
+                cursor.close()
+            if row is None:
+                raise ValueError(f"Unknown column {column} of {table_name}")
+            DataFetcher._column_types[key] = row[0]
+        return DataFetcher._column_types[key]
+
+    def _load_filter_table(self, table_name, column, value_list):
+        """
+        Copies value_list into a temporary table typed like table_name.column
+        and returns its name. The table is dropped when the transaction ends.
+        """
+        start_time = time.time()
+        filter_table = f"filter_{uuid.uuid4().hex}"
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(
+                f"CREATE TEMP TABLE {filter_table} ON COMMIT DROP AS "
+                f"SELECT {column} AS v FROM {table_name} WITH NO DATA"
+            )
+            buffer = BytesIO()
+            for value in value_list:
+                buffer.write(_copy_text_value(value).encode("utf-8"))
+                buffer.write(b"\n")
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {filter_table} (v) FROM STDIN", buffer)
+            # Give the planner real statistics for the semi-join
+            cursor.execute(f"ANALYZE {filter_table}")
+        finally:
+            cursor.close()
+        elapsed_time = time.time() - start_time
+        DataFetcher.logger.info(f"[{table_name}] - Loaded {len(value_list)} {column} values into {filter_table} | Time taken: {elapsed_time:.2f} seconds")
+        return filter_table
+
+    def _execute_as_dataframe(self, query, values, label, strategy=None):
+        strategy = (strategy or DB_FETCH_STRATEGY).lower()
+        start_time = time.time()
+        DataFetcher.logger.info(f"[{label}] - Fetching  records.")
+
+        if strategy == 'columnar':
+            df = self._fetch_columnar(query, values)
+        else:
+            with profile_stage("db"):
+                cursor = self.connection.cursor()
+                cursor.execute(query, values)
+                rows = cursor.fetchall()
+                columns = [desc[0] for desc in cursor.description]
+
+            with profile_stage("dataframe"):
+                df = pd.DataFrame(rows, columns=columns)
+
+        elapsed_time = time.time() - start_time 
+        DataFetcher.logger.info(f"[{label}] - Records fetched: {len(df)} | Time taken: {elapsed_time:.2f} seconds")
+        DataFetcher._record_query(label, elapsed_time, len(df))
+        profile_count("rows_fetched", len(df))
+        return df
+
+    @staticmethod
+    def _record_query(label, elapsed_time, rows):
+        profile_query(label, elapsed_time, rows)
+        observe_query(label, elapsed_time, rows)
+
+    def _fetch_columnar(self, query, values):
+        """
+        Builds the DataFrame column by column: Postgres renders the rows as CSV
+        through COPY and pandas' C parser decodes them straight into typed
+        columns, so no per-row Python tuples are created.
+        """
+        cursor = self.connection.cursor()
+
+        # Describe the result first, the column types drive the parser dtypes
+        with profile_stage("db"):
+            cursor.execute(f"SELECT * FROM ({query}) AS q LIMIT 0", values)
+        description = cursor.description
+
+        encoding = extensions.encodings[self.connection.encoding]
+        copy_sql = f"COPY ({cursor.mogrify(query, values).decode(encoding)}) TO STDOUT WITH (FORMAT csv, NULL '\\N')"
+        buffer = BytesIO()
+        with profile_stage("db"):
+            cursor.copy_expert(copy_sql, buffer)
+        cursor.close()
+        buffer.seek(0)
+
+        if buffer.getbuffer().nbytes == 0:
+            return pd.DataFrame(columns=[desc[0] for desc in description])
+
+        with profile_stage("dataframe"):
+            return _copy_csv_to_dataframe(buffer, description, encoding)
 
     def close(self):
-        # Use the standalone close_connection function to close the shared connection
-        self.close_connection(self.connection)
+        # Return the connection to the pool, broken connections are evicted there
+        DBConnection.release_connection(self.connection)
+        self.connection = None
+
+
+
+def _copy_csv_to_dataframe(buffer, description, encoding="utf-8"):
+    """
+    Parses the output of COPY ... WITH (FORMAT csv, NULL '\\N') into a
+    DataFrame typed after the cursor description. An unquoted \\N is NULL,
+    while "" and a quoted "\\N" are the text values they spell.
+    """
+    columns = [desc[0] for desc in description]
+    date_columns = {}
+    if pyarrow is not None:
+        # pandas' pyarrow engine cannot make \\N null in string columns, so use pyarrow.csv directly
+        column_types = {}
+        for desc in description:
+            if desc.type_code == PG_TIMESTAMPTZ:
+                column_types[desc.name] = pyarrow.string()
+                date_columns[desc.name] = True
+            elif desc.type_code in PG_DATE_TYPES:
+                column_types[desc.name] = pyarrow.timestamp("us")
+            else:
+                column_types[desc.name] = PG_ARROW_TYPES.get(desc.type_code, pyarrow.string())
+        table = pyarrow.csv.read_csv(
+            buffer,
+            read_options=pyarrow.csv.ReadOptions(column_names=columns, encoding=encoding),
+            convert_options=pyarrow.csv.ConvertOptions(
+                column_types=column_types,
+                null_values=["\\N"],
+                strings_can_be_null=True,
+                quoted_strings_can_be_null=False,
+                true_values=["t"],
+                false_values=["f"]
+            )
+        )
+        df = table.to_pandas(types_mapper={
+            pyarrow.bool_(): pd.BooleanDtype(),
+            pyarrow.int64(): pd.Int64Dtype(),
+        }.get)
+    else:
+        dtypes = {}
+        for desc in description:
+            if desc.type_code in PG_DATE_TYPES:
+                dtypes[desc.name] = str
+                date_columns[desc.name] = desc.type_code == PG_TIMESTAMPTZ
+            else:
+                dtypes[desc.name] = PG_COLUMN_DTYPES.get(desc.type_code, str)
+        df = pd.read_csv(
+            buffer,
+            engine="c",
+            names=columns,
+            header=None,
+            dtype=dtypes,
+            true_values=["t"],
+            false_values=["f"],
+            na_values=["\\N"],
+            keep_default_na=False,
+            encoding=encoding
+        )
+    for column, is_tz_aware in date_columns.items():
+        df[column] = pd.to_datetime(df[column], format="ISO8601", utc=is_tz_aware)
+    return df
+
+
+_COPY_DONE = object()
+
+
+class _QueueWriter:
+    """
+    File-like target for copy_expert that batches the COPY output into
+    chunks of chunk_bytes and hands them to the consuming generator.
+    """
+    def __init__(self, chunks, chunk_bytes, cancelled):
+        self.chunks = chunks
+        self.chunk_bytes = chunk_bytes
+        self.cancelled = cancelled
+        self.buffer = bytearray()
+
+    def write(self, data):
+        if self.cancelled.is_set():
+            raise IOError("COPY output is no longer being consumed.")
+        self.buffer += data
+        if len(self.buffer) >= self.chunk_bytes:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.put(bytes(self.buffer))
+            self.buffer.clear()
 
+    def put(self, item):
+        while not self.cancelled.is_set():
+            try:
+                self.chunks.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
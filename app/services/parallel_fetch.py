@@ -0,0 +1,46 @@
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from app.services.fetch_data import DataFetcher
+
+
+class ParallelFetcher:
+    """
+    Runs independent fetches concurrently, each on its own pooled connection.
+
+    The leading connection exports a REPEATABLE READ snapshot that every
+    other connection imports, so all fetches see the same database state.
+    """
+    logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def fetch_all(tasks):
+        """
+        Runs each task, a callable taking a DataFetcher, and returns a dict
+        of task name -> result. The first task runs on the leading
+        connection in the calling thread, the others in worker threads.
+
+        Parameters:
+        tasks (dict): Task name -> callable(fetcher), in submission order.
+        """
+        names = list(tasks)
+        with DataFetcher() as leader:
+            snapshot_id = leader.export_snapshot()
+            ParallelFetcher.logger.info(f"Running {len(names)} fetches in parallel on snapshot {snapshot_id}")
+
+            with ThreadPoolExecutor(max_workers=max(len(names) - 1, 1), thread_name_prefix="parallel-fetch") as executor:
+                # Tasks run in a copy of the caller's context and record into its request profile
+                futures = {
+                    name: executor.submit(contextvars.copy_context().run, ParallelFetcher._run_task, snapshot_id, tasks[name])
+                    for name in names[1:]
+                }
+                results = {names[0]: tasks[names[0]](leader)}
+                for name, future in futures.items():
+                    results[name] = future.result()
+        return results
+
+    @staticmethod
+    def _run_task(snapshot_id, task):
+        with DataFetcher() as fetcher:
+            fetcher.import_snapshot(snapshot_id)
+            return task(fetcher)
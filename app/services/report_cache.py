@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import zlib
+from datetime import datetime, timedelta
+from app.services.fetch_data import DataFetcher
+from app.services.report_query import ReportQueryBuilder
+from app.utils.compression import GZIP, GZIP_WBITS, decompress_stream
+from constants import (
+    REPORT_CACHE_DIR, REPORT_CACHE_MAX_BYTES, REPORT_CACHE_CLOSED_AFTER_DAYS, REPORT_CACHE_DATA_VERSION,
+    REPORT_CACHE_WATERMARK_COLUMN, REPORT_CACHE_MAX_AGE_SECONDS, REPORT_EXECUTION_MODE, REPORT_GZIP_LEVEL,
+    USER_ENROLMENTS_TABLE
+)
+
+READ_SIZE = 1024 * 1024
+PARTIAL_SUFFIX = ".part"
+ENTRY_FORMAT = "csv.gz"
+
+
+class ReportCache:
+    """
+    On-disk cache of finished reports for closed date windows.
+
+    Entries are keyed by org, date window, column set and a data watermark:
+    the row count and max(REPORT_CACHE_WATERMARK_COLUMN) of the org's
+    enrollments in the window, probed before every lookup, plus
+    REPORT_CACHE_DATA_VERSION for manual corrections. Changes the probe
+    cannot see are bounded by REPORT_CACHE_MAX_AGE_SECONDS, counted from the
+    entry's mtime. The directory is shared by all workers of the pod and kept
+    under REPORT_CACHE_MAX_BYTES by evicting the least recently used
+    entries, recency being tracked through the file atime. Entries are
+    stored gzip compressed and handed out as is to gzip capable clients.
+    """
+    logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def is_cacheable(end_date):
+        if REPORT_CACHE_MAX_BYTES <= 0:
+            return False
+        # Only windows that ended a while ago are immutable in practice
+        return end_date < datetime.now() - timedelta(days=REPORT_CACHE_CLOSED_AFTER_DAYS)
+
+    @staticmethod
+    def probe_watermark(org_id, start_date, end_date):
+        """
+        Returns the current data watermark of the org's enrollments in the
+        window, or None when it could not be probed.
+        """
+        query, values = ReportQueryBuilder.build_org_enrolments_watermark_query(
+            start_date, end_date, org_id, REPORT_CACHE_WATERMARK_COLUMN
+        )
+        with DataFetcher() as fetcher:
+            probe_df = fetcher.fetch_query_as_dataframe(query, values, label=f"{USER_ENROLMENTS_TABLE}_watermark")
+        if probe_df.empty:
+            return None
+        return [str(value) for value in probe_df.iloc[0]]
+
+    @staticmethod
+    def make_key(org_id, start_date, end_date, columns=None, output_format="csv", watermark=None):
+        key_parts = [
+            org_id, start_date.isoformat(), end_date.isoformat(), list(columns or []),
+            REPORT_EXECUTION_MODE.lower(), REPORT_CACHE_DATA_VERSION, ENTRY_FORMAT, watermark
+        ]
+        if output_format != "csv":
+            # Kept out of CSV keys so existing CSV entries stay valid
+            key_parts.append(output_format)
+        return hashlib.sha256(json.dumps(key_parts).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def open_entry(key):
+        """
+        Returns an open binary file for the cached entry, or None on a miss.
+        The entry stays readable even if another worker evicts it meanwhile.
+        """
+        entry_path = ReportCache._entry_path(key)
+        try:
+            entry_file = open(entry_path, "rb")
+        except FileNotFoundError:
+            ReportCache.logger.info(f"Report cache miss for {key}")
+            return None
+
+        # mtime is when the entry was written, atime when it was last used
+        entry_mtime = os.fstat(entry_file.fileno()).st_mtime
+        if time.time() - entry_mtime > REPORT_CACHE_MAX_AGE_SECONDS:
+            entry_file.close()
+            ReportCache.logger.info(f"Report cache entry {key} expired")
+            return None
+
+        try:
+            os.utime(entry_path, (time.time(), entry_mtime))  # Mark as recently used
+        except FileNotFoundError:
+            pass
+        ReportCache.logger.info(f"Report cache hit for {key}")
+        return entry_file
+
+    @staticmethod
+    def iter_entry(entry_file, encoding=None):
+        """
+        Yields the cached report, gzip encoded when encoding is 'gzip' and
+        as plain CSV otherwise.
+        """
+        if encoding == GZIP:
+            yield from ReportCache._read_entry(entry_file)
+            return
+        yield from decompress_stream(ReportCache._read_entry(entry_file), GZIP)
+
+    @staticmethod
+    def _read_entry(entry_file):
+        with entry_file:
+            while True:
+                data = entry_file.read(READ_SIZE)
+                if not data:
+                    return
+                yield data
+
+    @staticmethod
+    def store(key, chunks):
+        """
+        Passes chunks through while writing them, gzip compressed, to the
+        cache. The entry is only published once the source is exhausted
+        without errors.
+        """
+        os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+        entry_path = ReportCache._entry_path(key)
+        partial_path = f"{entry_path}.{os.getpid()}.{id(chunks)}{PARTIAL_SUFFIX}"
+        size_bytes = 0
+        published = False
+        try:
+            with open(partial_path, "wb") as partial_file:
+                compressor = zlib.compressobj(REPORT_GZIP_LEVEL, zlib.DEFLATED, GZIP_WBITS)
+                for chunk in chunks:
+                    partial_file.write(compressor.compress(chunk))
+                    size_bytes += len(chunk)
+                    yield chunk
+                partial_file.write(compressor.flush())
+
+            if size_bytes > 0:
+                os.replace(partial_path, entry_path)
+                published = True
+                ReportCache.logger.info(
+                    f"Report cached as {key} ({size_bytes} bytes, {os.path.getsize(entry_path)} compressed)"
+                )
+                ReportCache._evict()
+        finally:
+            if not published and os.path.exists(partial_path):
+                os.remove(partial_path)
+
+    @staticmethod
+    def _entry_path(key):
+        return os.path.join(REPORT_CACHE_DIR, key)
+
+    @staticmethod
+    def _evict():
+        entries = []
+        total_bytes = 0
+        for entry in os.scandir(REPORT_CACHE_DIR):
+            if entry.name.endswith(PARTIAL_SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_atime, stat.st_size, entry.path))
+            total_bytes += stat.st_size
+
+        # Oldest atime first, i.e. least recently used
+        for _, size_bytes, path in sorted(entries):
+            if total_bytes <= REPORT_CACHE_MAX_BYTES:
+                break
+            try:
+                os.remove(path)
+                ReportCache.logger.info(f"Evicted report cache entry {os.path.basename(path)} ({size_bytes} bytes)")
+            except FileNotFoundError:
+                pass
+            total_bytes -= size_bytes
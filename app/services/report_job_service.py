@@ -0,0 +1,192 @@
+import os
+import re
+import json
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from app.services.report_service import ReportService
+from constants import REPORT_JOB_WORKERS, REPORT_JOB_DIR, REPORT_JOB_TTL_SECONDS, REPORT_JOB_HEARTBEAT_SECONDS
+
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+ACTIVE_STATUSES = ("queued", "running")
+# Heartbeats an active job may miss before it is considered abandoned
+MISSED_HEARTBEATS = 4
+
+
+class ReportJobService:
+    """
+    Runs report generation in a background thread pool.
+
+    Job status and results live as files under REPORT_JOB_DIR, so any
+    gunicorn worker on the same host can answer status and download
+    requests for a job submitted to another worker.
+
+    Each job records the pid of the worker that owns it, and that worker
+    refreshes updated_at of its queued and running jobs every
+    REPORT_JOB_HEARTBEAT_SECONDS. get_job() marks an active job failed once
+    its owner is gone or its heartbeat stopped.
+    """
+    logger = logging.getLogger(__name__)
+    _executor = None
+    _executor_lock = threading.Lock()
+    _jobs_lock = threading.Lock()
+    _active_jobs = {}
+
+    @staticmethod
+    def submit_job(org_id, start_date, end_date, required_columns=None):
+        os.makedirs(REPORT_JOB_DIR, exist_ok=True)
+        ReportJobService._cleanup_expired_jobs()
+
+        now = datetime.now().isoformat()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "org_id": org_id,
+            "status": "queued",
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "created_at": now,
+            "updated_at": now,
+            "owner_pid": os.getpid(),
+            "size_bytes": None,
+            "error": None
+        }
+        # The worker updates its own copy, the caller gets the queued snapshot
+        active_job = dict(job)
+        executor = ReportJobService._get_executor()
+        with ReportJobService._jobs_lock:
+            ReportJobService._write_job(active_job)
+            ReportJobService._active_jobs[job["job_id"]] = active_job
+        executor.submit(
+            ReportJobService._run_job, active_job, start_date, end_date, required_columns
+        )
+        ReportJobService.logger.info(f"Queued report job {job['job_id']} for org_id={org_id}")
+        return job
+
+    @staticmethod
+    def get_job(job_id):
+        if not JOB_ID_PATTERN.match(job_id or ""):
+            return None
+        try:
+            with open(ReportJobService._job_path(job_id), "r", encoding="utf-8") as f:
+                job = json.load(f)
+        except FileNotFoundError:
+            return None
+
+        if job["status"] in ACTIVE_STATUSES and ReportJobService._is_abandoned(job):
+            ReportJobService.logger.warning(f"Report job {job_id} was abandoned by worker pid={job.get('owner_pid')}, marking it failed.")
+            job.update(status="failed", error="The worker running this job stopped before it finished.")
+            job["updated_at"] = datetime.now().isoformat()
+            ReportJobService._write_job(job)
+        return job
+
+    @staticmethod
+    def get_result_path(job_id):
+        return os.path.join(REPORT_JOB_DIR, f"{job_id}.csv")
+
+    @staticmethod
+    def _run_job(job, start_date, end_date, required_columns):
+        job_id = job["job_id"]
+        result_path = ReportJobService.get_result_path(job_id)
+        partial_path = f"{result_path}.part"
+        ReportJobService._update_job(job, status="running")
+        try:
+            size_bytes = 0
+            with open(partial_path, "wb") as f:
+                for chunk in ReportService.stream_total_learning_hours_csv(start_date, end_date, job["org_id"], required_columns):
+                    f.write(chunk)
+                    size_bytes += len(chunk)
+
+            if size_bytes == 0:
+                os.remove(partial_path)
+                ReportJobService._update_job(job, status="empty", size_bytes=0)
+                ReportJobService.logger.info(f"Report job {job_id} found no data.")
+                return
+
+            os.replace(partial_path, result_path)
+            ReportJobService._update_job(job, status="completed", size_bytes=size_bytes)
+            ReportJobService.logger.info(f"Report job {job_id} completed with {size_bytes} bytes.")
+        except Exception as e:
+            ReportJobService.logger.exception(f"Report job {job_id} failed: {e}")
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            ReportJobService._update_job(job, status="failed", error=str(e))
+        finally:
+            with ReportJobService._jobs_lock:
+                ReportJobService._active_jobs.pop(job_id, None)
+
+    @staticmethod
+    def _get_executor():
+        if ReportJobService._executor is None:
+            with ReportJobService._executor_lock:
+                if ReportJobService._executor is None:
+                    ReportJobService._executor = ThreadPoolExecutor(
+                        max_workers=REPORT_JOB_WORKERS, thread_name_prefix="report-job"
+                    )
+                    threading.Thread(target=ReportJobService._heartbeat, name="report-job-heartbeat", daemon=True).start()
+        return ReportJobService._executor
+
+    @staticmethod
+    def _heartbeat():
+        while True:
+            time.sleep(REPORT_JOB_HEARTBEAT_SECONDS)
+            with ReportJobService._jobs_lock:
+                active_jobs = list(ReportJobService._active_jobs.values())
+            for job in active_jobs:
+                try:
+                    ReportJobService._update_job(job)
+                except Exception as e:
+                    ReportJobService.logger.error(f"Error refreshing report job {job['job_id']}: {e}")
+
+    @staticmethod
+    def _is_abandoned(job):
+        updated_at = datetime.fromisoformat(job["updated_at"])
+        if (datetime.now() - updated_at).total_seconds() > REPORT_JOB_HEARTBEAT_SECONDS * MISSED_HEARTBEATS:
+            return True
+        owner_pid = job.get("owner_pid")
+        if owner_pid is None:
+            return False
+        try:
+            os.kill(owner_pid, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
+        return False
+
+    @staticmethod
+    def _update_job(job, **changes):
+        # The job thread and the heartbeat both write the job, one at a time
+        with ReportJobService._jobs_lock:
+            job.update(changes)
+            job["updated_at"] = datetime.now().isoformat()
+            ReportJobService._write_job(job)
+
+    @staticmethod
+    def _write_job(job):
+        # Write then rename, so readers in other workers never see a half written file
+        job_path = ReportJobService._job_path(job["job_id"])
+        tmp_path = f"{job_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, job_path)
+
+    @staticmethod
+    def _job_path(job_id):
+        return os.path.join(REPORT_JOB_DIR, f"{job_id}.json")
+
+    @staticmethod
+    def _cleanup_expired_jobs():
+        cutoff = time.time() - REPORT_JOB_TTL_SECONDS
+        try:
+            for entry in os.scandir(REPORT_JOB_DIR):
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    # Already removed by another worker
+                    continue
+        except Exception as e:
+            ReportJobService.logger.error(f"Error cleaning up expired report jobs: {e}")
@@ -0,0 +1,160 @@
+import logging
+from constants import USER_DETAILS_TABLE, CONTENT_TABLE, USER_ENROLMENTS_TABLE
+
+logger = logging.getLogger(__name__)
+
+
+class ReportQueryBuilder:
+    """
+    Builds the SQL statements used to generate the learning hours report.
+
+    The column lists below are the source of truth for which report column
+    comes from which table, in the same order the pandas merge produces them.
+    """
+    USER_COLUMNS = ["user_id", "mdo_id", "full_name"]
+    ENROLMENT_COLUMNS = ["user_id", "certificate_generated", "content_id", "enrolled_on", "first_completed_on", "last_completed_on"]
+    CONTENT_COLUMNS = ["content_id", "content_duration", "content_name"]
+    # Logical type of every report column, so typed outputs never depend on the values of one chunk
+    COLUMN_TYPES = {
+        "user_id": "string",
+        "mdo_id": "string",
+        "full_name": "string",
+        "certificate_generated": "boolean",
+        "content_id": "string",
+        "enrolled_on": "timestamp",
+        "first_completed_on": "timestamp",
+        "last_completed_on": "timestamp",
+        "content_duration": "float",
+        "content_name": "string",
+    }
+
+    @staticmethod
+    def merged_columns():
+        """
+        Returns the columns of the merged user/enrollment/content frame, in merge order.
+        """
+        columns = list(ReportQueryBuilder.USER_COLUMNS)
+        for col in ReportQueryBuilder.ENROLMENT_COLUMNS + ReportQueryBuilder.CONTENT_COLUMNS:
+            if col not in columns:
+                columns.append(col)
+        return columns
+
+    @staticmethod
+    def column_source(column):
+        """
+        Returns the table alias ('u', 'e' or 'c') a report column is selected from.
+        """
+        if column in ReportQueryBuilder.USER_COLUMNS:
+            return "u"
+        if column in ReportQueryBuilder.ENROLMENT_COLUMNS:
+            return "e"
+        if column in ReportQueryBuilder.CONTENT_COLUMNS:
+            return "c"
+        return None
+
+    @staticmethod
+    def resolve_output_columns(required_columns=None):
+        """
+        Returns the report columns to select, in the requested order, skipping
+        columns that do not exist in any of the source tables.
+        """
+        merged_columns = ReportQueryBuilder.merged_columns()
+        if not required_columns:
+            return merged_columns
+
+        output_columns = []
+        for col in required_columns:
+            if col in merged_columns and col not in output_columns:
+                output_columns.append(col)
+
+        missing_columns = sorted(set(required_columns) - set(output_columns))
+        if missing_columns:
+            logger.info(f"Warning: Missing columns skipped: {missing_columns}")
+        return output_columns
+
+    @staticmethod
+    def resolve_table_columns(output_columns):
+        """
+        Resolves report output columns to the minimal column list each source
+        table has to provide, join keys included.
+
+        Returns:
+        dict: {"users": [...], "enrollments": [...], "content": [...]}
+        """
+        def project(table_columns, keys):
+            return keys + [col for col in table_columns if col in output_columns and col not in keys]
+
+        return {
+            "users": project(ReportQueryBuilder.USER_COLUMNS, ["user_id"]),
+            "enrollments": project(ReportQueryBuilder.ENROLMENT_COLUMNS, ["user_id", "content_id"]),
+            "content": project(ReportQueryBuilder.CONTENT_COLUMNS, ["content_id"])
+        }
+
+    @staticmethod
+    def build_total_learning_hours_query(start_date, end_date, mdo_id, required_columns=None):
+        """
+        Builds a single statement that joins users, enrollments and content,
+        filters by mdo_id and enrollment date and projects the report columns,
+        so that only the final report rows leave the database.
+
+        Returns:
+        tuple: (query, values, output_columns)
+        """
+        output_columns = ReportQueryBuilder.resolve_output_columns(required_columns)
+        if not output_columns:
+            raise ValueError("None of the requested report columns are available.")
+
+        select_clause = ", ".join(
+            f"{ReportQueryBuilder.column_source(col)}.{col}" for col in output_columns
+        )
+        query = f"""
+            SELECT {select_clause}
+            FROM {USER_DETAILS_TABLE} u
+            JOIN {USER_ENROLMENTS_TABLE} e ON e.user_id = u.user_id
+            JOIN {CONTENT_TABLE} c ON c.content_id = e.content_id
+            WHERE u.mdo_id = %s
+              AND e.enrolled_on >= %s
+              AND e.enrolled_on <= %s
+        """
+        values = [mdo_id, start_date, end_date]
+        return query, values, output_columns
+
+    @staticmethod
+    def build_org_enrolments_query(start_date, end_date, mdo_id, columns=None):
+        """
+        Builds the enrollment query for the users of mdo_id, semi-joined
+        server-side so it does not depend on the user fetch.
+
+        Returns:
+        tuple: (query, values)
+        """
+        columns = columns or ReportQueryBuilder.ENROLMENT_COLUMNS
+        select_clause = ", ".join(f"e.{col}" for col in columns)
+        query = f"""
+            SELECT {select_clause}
+            FROM {USER_ENROLMENTS_TABLE} e
+            WHERE e.user_id IN (SELECT u.user_id FROM {USER_DETAILS_TABLE} u WHERE u.mdo_id = %s)
+              AND e.enrolled_on >= %s
+              AND e.enrolled_on <= %s
+        """
+        values = [mdo_id, start_date, end_date]
+        return query, values
+
+    @staticmethod
+    def build_org_enrolments_watermark_query(start_date, end_date, mdo_id, watermark_column):
+        """
+        Builds a query returning the row count and the max of watermark_column
+        over the enrollments build_org_enrolments_query would return.
+
+        Returns:
+        tuple: (query, values)
+        """
+        query = f"""
+            SELECT count(*), max(e.{watermark_column})
+            FROM {USER_ENROLMENTS_TABLE} e
+            WHERE e.user_id IN (SELECT u.user_id FROM {USER_DETAILS_TABLE} u WHERE u.mdo_id = %s)
+              AND e.enrolled_on >= %s
+              AND e.enrolled_on <= %s
+        """
+        values = [mdo_id, start_date, end_date]
+        return query, values
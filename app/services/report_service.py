@@ -1,11 +1,25 @@
 import logging
-from io import BytesIO
 from cryptography.fernet import Fernet
 import pandas as pd
 from app.models.report_model import ReportData
 from app.services.fetch_data import DataFetcher
-from constants import USER_DETAILS_TABLE, CONTENT_TABLE, USER_ENROLMENTS_TABLE
-import gc
+from app.services.report_query import ReportQueryBuilder
+from app.services.content_cache import ContentCache
+from app.services.single_flight import SingleFlight
+from app.services.report_cache import ReportCache
+from app.services.parallel_fetch import ParallelFetcher
+from app.utils.stream_encryption import encrypt_stream
+from app.utils.compression import GZIP, compress_stream
+from app.utils.columnar_writer import COLUMNAR_FORMATS, write_columnar_stream
+from app.utils.request_profile import profile_stage, profile_count
+from app.utils.metrics import count_report_rows
+from constants import (
+    USER_DETAILS_TABLE, USER_ENROLMENTS_TABLE, REPORT_EXECUTION_MODE, DB_CURSOR_ITERSIZE,
+    REPORT_SINGLE_FLIGHT_ENABLED, REPORT_PARALLEL_FETCH_ENABLED, REPORT_ENROLMENT_PARTITIONS,
+    REPORT_ENCRYPTION_SEGMENT_BYTES, REPORT_MEMORY_BUDGET_MB, CONTENT_FILTER_MAX_IDS
+)
+
+CSV = "csv"
 
 
 logging.basicConfig(
@@ -17,14 +31,24 @@ class ReportService:
     logger = logging.getLogger(__name__)
 
     @staticmethod
-    def generate_csv(org_id):
+    def generate_csv(org_id, encryption_key=None):
+        """
+        Returns the CSV for org_id. With an encryption_key (raw master key
+        bytes) the CSV is returned in the segmented stream format of
+        app.utils.stream_encryption instead.
+        """
         try:
-            csv_stream = DataFetcher.fetch_data_as_csv_stream(DataFetcher(), USER_DETAILS_TABLE, org_id)
+            with DataFetcher() as fetcher:
+                csv_stream = fetcher.fetch_data_as_csv_stream(USER_DETAILS_TABLE, org_id)
             ReportService.logger.info("Data fetched successfully for CSV generation.")
 
             if not csv_stream:
                 return b""
 
+            if encryption_key:
+                csv_chunks = iter(lambda: csv_stream.read(REPORT_ENCRYPTION_SEGMENT_BYTES), b"")
+                return b"".join(encrypt_stream(csv_chunks, encryption_key))
+
             return csv_stream.read()
 
         except Exception as e:
@@ -41,91 +65,355 @@ class ReportService:
             raise
 
     @staticmethod
-    def get_total_learning_hours_csv_stream(start_date, end_date, mdo_id, required_columns=None):
-        try:
-            fetcher = DataFetcher()
+    def stream_total_learning_hours_csv(start_date, end_date, mdo_id, required_columns=None, encoding=None):
+        """
+        Yields the learning hours report as CSV encoded byte chunks, header first.
+        Yields nothing when there is no data for the org and date range.
+        """
+        return ReportService.stream_total_learning_hours_report(
+            start_date, end_date, mdo_id, required_columns, encoding=encoding
+        )
 
-            # Fetch filtered user data
-            user_df = fetcher.fetch_data_as_dataframe(
-                USER_DETAILS_TABLE,
-                {"mdo_id": mdo_id},
-                columns=["user_id", "mdo_id", "full_name"]
-            )
+    @staticmethod
+    def stream_total_learning_hours_report(start_date, end_date, mdo_id, required_columns=None, output_format=CSV, encoding=None):
+        """
+        Yields the learning hours report as byte chunks in output_format
+        ('csv', 'parquet' or 'arrow'). Yields nothing when there is no data
+        for the org and date range.
+
+        Reports for closed date windows are served from the on-disk report
+        cache when possible, and identical concurrent requests share a
+        single computation. With an encoding ('gzip' or 'zstd') the chunks
+        are compressed incrementally.
+        """
+        required_columns = ReportQueryBuilder.resolve_output_columns(required_columns)
+        cache_key = None
+        watermark = ReportCache.probe_watermark(mdo_id, start_date, end_date) if ReportCache.is_cacheable(end_date) else None
+        if watermark is not None:
+            cache_key = ReportCache.make_key(mdo_id, start_date, end_date, required_columns, output_format, watermark)
+            cached_entry = ReportCache.open_entry(cache_key)
+            if cached_entry:
+                if encoding == GZIP:
+                    # Cache entries are stored gzip compressed, pass them through untouched
+                    yield from ReportCache.iter_entry(cached_entry, GZIP)
+                    return
+                yield from ReportService._encode(ReportCache.iter_entry(cached_entry), encoding)
+                return
+
+        def generate():
+            if output_format in COLUMNAR_FORMATS:
+                report_chunks = write_columnar_stream(
+                    ReportService.iter_total_learning_hours_frames(start_date, end_date, mdo_id, required_columns),
+                    output_format,
+                    column_types=ReportQueryBuilder.COLUMN_TYPES
+                )
+            else:
+                report_chunks = ReportService._generate_total_learning_hours_csv(start_date, end_date, mdo_id, required_columns)
+            if cache_key:
+                return ReportCache.store(cache_key, report_chunks)
+            return report_chunks
+
+        if REPORT_SINGLE_FLIGHT_ENABLED.lower() != 'true':
+            yield from ReportService._encode(generate(), encoding)
+            return
+
+        # The flight is shared uncompressed, every consumer compresses with its own encoding
+        flight_key = (mdo_id, start_date, end_date, tuple(required_columns or ()), output_format)
+        yield from ReportService._encode(SingleFlight.stream(flight_key, generate), encoding)
+
+    @staticmethod
+    def _encode(csv_chunks, encoding):
+        if not encoding:
+            return csv_chunks
+        return compress_stream(csv_chunks, encoding)
+
+    @staticmethod
+    def _generate_total_learning_hours_csv(start_date, end_date, mdo_id, required_columns=None):
+        if REPORT_EXECUTION_MODE.lower() == 'copy':
+            yield from ReportService._stream_copy_csv(start_date, end_date, mdo_id, required_columns)
+            return
+
+        total_rows = 0
+        for chunk_df in ReportService.iter_total_learning_hours_frames(start_date, end_date, mdo_id, required_columns):
+            if chunk_df.empty:
+                continue
+            with profile_stage("serialize"):
+                csv_bytes = chunk_df.to_csv(index=False, header=total_rows == 0).encode("utf-8")
+            total_rows += len(chunk_df)
+            profile_count("rows_produced", len(chunk_df))
+            count_report_rows(len(chunk_df))
+            yield csv_bytes
+
+        ReportService.logger.info(f"CSV stream generated with {total_rows} rows.")
+
+    @staticmethod
+    def _stream_copy_csv(start_date, end_date, mdo_id, required_columns=None):
+        # Postgres joins, filters and renders the CSV, the bytes are passed through untouched
+        query, values, _ = ReportQueryBuilder.build_total_learning_hours_query(
+            start_date, end_date, mdo_id, required_columns
+        )
+        with DataFetcher() as fetcher:
+            csv_chunks = fetcher.stream_query_as_csv(query, values, label="learning_hours_report")
+            try:
+                # COPY always emits the header line, a first chunk holding only the header means no rows
+                first_chunk = next(csv_chunks, None)
+                if first_chunk is None or first_chunk.count(b"\n") <= 1:
+                    ReportService.logger.info("No report rows found for given mdo_id and date range.")
+                    return
+                yield first_chunk
+                yield from csv_chunks
+            finally:
+                csv_chunks.close()
+
+    @staticmethod
+    def iter_total_learning_hours_frames(start_date, end_date, mdo_id, required_columns=None):
+        """
+        Yields the learning hours report as DataFrame chunks, already projected
+        to the report columns. In 'sql' and 'copy' mode the join runs in
+        Postgres, in pandas mode enrollments are joined batch by batch, sized
+        to stay within REPORT_MEMORY_BUDGET_MB.
+        """
+        required_columns = ReportQueryBuilder.resolve_output_columns(required_columns)
+        # COPY only pays off for CSV text, columnar output reads the same pushed-down query through a cursor
+        if REPORT_EXECUTION_MODE.lower() in ('sql', 'copy'):
+            with DataFetcher() as fetcher:
+                # Join, filter and project in Postgres, rows arrive chunk by chunk
+                query, values, _ = ReportQueryBuilder.build_total_learning_hours_query(
+                    start_date, end_date, mdo_id, required_columns
+                )
+                yield from fetcher.fetch_query_as_dataframe_chunks(query, values, label="learning_hours_report")
+            return
 
-            if user_df.empty:
-                ReportService.logger.info("No users found for given mdo_id.")
-                return None
+        budget = _MemoryBudget(REPORT_MEMORY_BUDGET_MB * 1024 * 1024)
+        if REPORT_PARALLEL_FETCH_ENABLED.lower() == 'true':
+            yield from ReportService._iter_merged_parallel(start_date, end_date, mdo_id, required_columns, budget)
+        else:
+            with DataFetcher() as fetcher:
+                yield from ReportService._iter_merged_pandas(fetcher, start_date, end_date, mdo_id, required_columns, budget)
 
-            user_ids = user_df["user_id"].tolist()
-            ReportService.logger.info(f"Fetched {len(user_ids)} users.")
+    @staticmethod
+    def _iter_merged_pandas(fetcher, start_date, end_date, mdo_id, required_columns, budget):
+        # Only fetch the columns the requested report columns and the joins need
+        table_columns = ReportQueryBuilder.resolve_table_columns(required_columns)
 
-            # Fetch filtered enrollment data
+        # Fetch filtered user data
+        user_df = fetcher.fetch_data_as_dataframe(
+            USER_DETAILS_TABLE,
+            {"mdo_id": mdo_id},
+            columns=table_columns["users"]
+        )
+
+        if user_df.empty:
+            ReportService.logger.info("No users found for given mdo_id.")
+            return
+
+        ReportService.logger.info(f"Fetched {len(user_df)} users.")
+
+        # Fetch filtered enrollment data
+        if REPORT_ENROLMENT_PARTITIONS > 1:
+            enrollment_df = ReportService._fetch_org_enrollments(
+                fetcher, start_date, end_date, mdo_id, table_columns["enrollments"]
+            )
+            enrollment_batches = _slice_frame(enrollment_df, budget)
+        else:
+            # The user filter is pushed into SQL, see DataFetcher._build_in_condition
             enrollment_filters = {
+                "user_id__in": user_df["user_id"].tolist(),
                 "enrolled_on__gte": start_date,
                 "enrolled_on__lte": end_date
             }
 
-            enrollment_df = fetcher.fetch_data_as_dataframe(
+            # Stream enrollments through a server-side cursor, the batch size follows the memory budget
+            enrollment_batches = fetcher.fetch_data_as_dataframe_chunks(
                 USER_ENROLMENTS_TABLE,
                 enrollment_filters,
-                columns=["user_id", "certificate_generated", "content_id", "enrolled_on", "first_completed_on", "last_completed_on"]
+                columns=table_columns["enrollments"],
+                chunk_size=budget.batch_rows
             )
 
-            if enrollment_df.empty:
-                ReportService.logger.info("No enrollment data found for the given date range.")
-                return None
+        # Content data comes from the per-process cache, indexed by content_id. While the
+        # cache is cold, small orgs only fetch the content their enrollments reference
+        content_lookup = _ContentLookup(budget, fetcher)
 
-            # Filter enrollment to only matching user_ids
-            enrollment_df = enrollment_df[enrollment_df["user_id"].isin(user_ids)]
-            if enrollment_df.empty:
-                ReportService.logger.info("No enrollments matched the filtered user IDs.")
-                return None
+        yield from ReportService._join_batches(user_df, enrollment_batches, content_lookup, required_columns, budget)
 
-            # Fetch content data (consider filtering by content_id list if needed)
-            content_df = fetcher.fetch_data_as_dataframe(
-                CONTENT_TABLE,
-                columns=["content_id", "content_duration", "content_name"]
-            )
+    @staticmethod
+    def _iter_merged_parallel(start_date, end_date, mdo_id, required_columns, budget):
+        table_columns = ReportQueryBuilder.resolve_table_columns(required_columns)
 
-            if content_df.empty:
-                ReportService.logger.info("No content data found.")
-                return None
+        # Enrollments are semi-joined by mdo_id in SQL, so all three fetches are independent
+        frames = ParallelFetcher.fetch_all({
+            "users": lambda fetcher: fetcher.fetch_data_as_dataframe(
+                USER_DETAILS_TABLE,
+                {"mdo_id": mdo_id},
+                columns=table_columns["users"]
+            ),
+            "enrollments": lambda fetcher: ReportService._fetch_org_enrollments(
+                fetcher, start_date, end_date, mdo_id, table_columns["enrollments"]
+            ),
+            "content": ContentCache.get_content_frame
+        })
 
-            # Merge all three datasets
-            merged_df = (
-                user_df
-                .merge(enrollment_df, on="user_id", how="inner")
-                .merge(content_df, on="content_id", how="inner")
-            )
+        if frames["users"].empty:
+            ReportService.logger.info("No users found for given mdo_id.")
+            return
+        ReportService.logger.info(f"Fetched {len(frames['users'])} users.")
 
-            if merged_df.empty:
-                ReportService.logger.info("Merged dataset is empty.")
-                return None
-
-            # Convert content_duration to numeric
-            #merged_df["content_duration"] = pd.to_numeric(merged_df.get("content_duration", 0), errors="coerce").fillna(0)
-
-            # Optional: calculate total learning hours per user
-            # merged_df["total_learning_hours"] = merged_df.groupby("user_id")["content_duration"].transform("sum")
-
-            # Filter columns if specified
-            if required_columns:
-                existing_columns = [col for col in required_columns if col in merged_df.columns]
-                missing_columns = list(set(required_columns) - set(existing_columns))
-                if missing_columns:
-                    ReportService.logger.info(f"Warning: Missing columns skipped: {missing_columns}")
-                merged_df = merged_df[existing_columns]
-
-            # Convert to CSV
-            csv_stream = BytesIO()
-            merged_df.to_csv(csv_stream, index=False)
-            csv_stream.seek(0)
-            ReportService.logger.info(f"CSV stream generated with {len(merged_df)} rows.")
-            del user_df, enrollment_df, content_df, merged_df
-            gc.collect()
-            
-            return csv_stream.getvalue()
+        enrollment_batches = _slice_frame(frames.pop("enrollments"), budget)
+        content_lookup = _ContentLookup(budget, content_df=frames.pop("content"))
+        yield from ReportService._join_batches(frames.pop("users"), enrollment_batches, content_lookup, required_columns, budget)
 
-        except Exception as e:
-            ReportService.logger.error(f"Error generating CSV stream: {e}")
-            return None
+    @staticmethod
+    def _fetch_org_enrollments(fetcher, start_date, end_date, mdo_id, columns):
+        if REPORT_ENROLMENT_PARTITIONS > 1 and "enrolled_on" not in columns:
+            # The partition ranges are applied on enrolled_on, it is dropped again after the merge
+            columns = columns + ["enrolled_on"]
+        query, values = ReportQueryBuilder.build_org_enrolments_query(start_date, end_date, mdo_id, columns)
+        # Scan the date window as parallel sub-ranges over one shared snapshot, a single
+        # partition is fetched directly. Errors are raised, an empty frame would read as "no data"
+        return fetcher.fetch_date_partitioned_dataframe(
+            query, values, "enrolled_on", start_date, end_date, REPORT_ENROLMENT_PARTITIONS, label=USER_ENROLMENTS_TABLE
+        )
+
+    @staticmethod
+    def _join_batches(user_df, enrollment_batches, content_lookup, required_columns, budget):
+        """
+        Joins enrollment batches against the user and content lookups, both
+        indexed by their key, and yields each batch projected to the report
+        columns. No full-size intermediate frame is ever built.
+        """
+        table_columns = ReportQueryBuilder.resolve_table_columns(required_columns)
+        user_lookup = user_df.set_index("user_id")[table_columns["users"][1:]]
+        content_columns = table_columns["content"][1:]
+        budget.reserve(user_lookup)
+
+        total_rows = 0
+        for enrollment_batch in enrollment_batches:
+            if enrollment_batch.empty:
+                continue
+
+            content_df = content_lookup.for_batch(enrollment_batch["content_id"])
+            if content_df is None or content_df.empty:
+                continue
+
+            with profile_stage("merge"):
+                merged_batch = (
+                    enrollment_batch
+                    .join(user_lookup, on="user_id", how="inner")
+                    .join(content_df[content_columns], on="content_id", how="inner")
+                )
+                # Order the columns as requested and drop join-only columns
+                merged_batch = merged_batch[required_columns]
+            budget.observe(enrollment_batch, merged_batch)
+            if merged_batch.empty:
+                continue
+
+            total_rows += len(merged_batch)
+            yield merged_batch
+
+        budget.release(user_lookup)
+        content_lookup.release()
+        if total_rows == 0:
+            ReportService.logger.info("Merged dataset is empty.")
+        else:
+            ReportService.logger.info(f"Joined {total_rows} report rows in batches.")
+
+
+def _slice_frame(frame, budget):
+    # Frames fetched in one go are still joined in budget sized slices
+    offset = 0
+    while offset < len(frame):
+        rows = budget.batch_rows()
+        yield frame.iloc[offset:offset + rows]
+        offset += rows
+
+
+class _MemoryBudget:
+    """
+    Sizes enrollment batches so that the user and content lookups plus the
+    batches being joined stay within budget_bytes. The first batch uses
+    DB_CURSOR_ITERSIZE rows, later ones are derived from its measured row
+    width. A budget of 0 disables the sizing.
+
+    Only the streamed enrollment fetch is bounded this way. With
+    REPORT_ENROLMENT_PARTITIONS > 1 or REPORT_PARALLEL_FETCH_ENABLED the
+    whole enrollment frame is fetched first and only joined in slices.
+    """
+    MIN_BATCH_ROWS = 1000
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.reserved_bytes = 0
+        self.row_bytes = None
+
+    def reserve(self, frame):
+        self.reserved_bytes += int(frame.memory_usage(deep=True).sum())
+
+    def release(self, frame):
+        self.reserved_bytes -= int(frame.memory_usage(deep=True).sum())
+
+    def observe(self, enrollment_batch, merged_batch):
+        # Per batch, the fetched enrollments and the joined result exist at the same time.
+        # Row widths hardly vary between batches, measuring the first one is enough
+        if self.row_bytes is not None or enrollment_batch.empty:
+            return
+        batch_bytes = enrollment_batch.memory_usage(deep=True).sum() + merged_batch.memory_usage(deep=True).sum()
+        self.row_bytes = max(int(batch_bytes / len(enrollment_batch)), 1)
+
+    def batch_rows(self):
+        if self.budget_bytes <= 0 or self.row_bytes is None:
+            return DB_CURSOR_ITERSIZE
+        available_bytes = self.budget_bytes - self.reserved_bytes
+        return max(available_bytes // self.row_bytes, self.MIN_BATCH_ROWS)
+
+
+class _ContentLookup:
+    """
+    Content rows for the enrollment batches of one report, indexed by
+    content_id. While the content cache is cold, only content_ids
+    referenced by the batches so far are fetched, until more than
+    CONTENT_FILTER_MAX_IDS distinct ids have been seen, and the cache is
+    warmed in the background for the reports that follow.
+    """
+    def __init__(self, budget, fetcher=None, content_df=None):
+        self.budget = budget
+        self.fetcher = fetcher
+        self.content_df = None
+        self.complete = content_df is not None
+        self.seen_ids = set()
+        self._set_content(content_df)
+
+    def for_batch(self, content_ids):
+        if self.complete:
+            return self.content_df
+        if ContentCache.is_warm():
+            return self._load_catalog()
+
+        new_ids = [content_id for content_id in content_ids.unique() if content_id not in self.seen_ids]
+        if not new_ids:
+            return self.content_df
+        self.seen_ids.update(new_ids)
+        if len(self.seen_ids) > CONTENT_FILTER_MAX_IDS:
+            return self._load_catalog()
+
+        ContentCache.warm_in_background()
+        content_df = ContentCache.fetch_referenced(self.fetcher, new_ids)
+        if not content_df.empty:
+            self._set_content(content_df if self.content_df is None else pd.concat([self.content_df, content_df]))
+        return self.content_df
+
+    def release(self):
+        self._set_content(None)
+
+    def _load_catalog(self):
+        self._set_content(ContentCache.get_content_frame(self.fetcher))
+        self.complete = True
+        return self.content_df
+
+    def _set_content(self, content_df):
+        # The content rows stay resident next to the batches, keep them out of the batch budget
+        if self.content_df is not None:
+            self.budget.release(self.content_df)
+        self.content_df = content_df
+        if content_df is not None:
+            self.budget.reserve(content_df)
@@ -0,0 +1,294 @@
+import os
+import time
+import uuid
+import fcntl
+import struct
+import zlib
+import hashlib
+import logging
+import tempfile
+import threading
+from constants import REPORT_SPOOL_DIR
+
+READ_SIZE = 1024 * 1024
+FLIGHT_DIR = os.path.join(REPORT_SPOOL_DIR or tempfile.gettempdir(), "report-flights")
+# Spool header: status (1) | payload length (8), rewritten in place when the flight ends
+SPOOL_HEADER = struct.Struct(">BQ")
+RUNNING, COMPLETED, FAILED = 0, 1, 2
+POLL_SECONDS = (0.02, 0.25)
+# The spool is deflate compressed at a fast level, CSV shrinks several times over
+SPOOL_COMPRESSION_LEVEL = 1
+# How often each process sweeps the lock and spool files of flights nobody leads anymore
+SWEEP_SECONDS = 300
+
+
+class SingleFlightError(Exception):
+    pass
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent streams across all worker processes of the pod.
+
+    The first caller for a key becomes the leader: it takes an exclusive
+    flock on the key's lock file in FLIGHT_DIR, runs the source and appends
+    every chunk, deflate compressed, to a spool file whose name it writes
+    into the lock file. Callers that find the lock taken (in any process or
+    thread) tail that spool instead, at their own pace and with bounded
+    memory. The leader marks the spool completed or failed in its header,
+    and the kernel drops the lock if the leader dies, so followers never
+    wait forever. The leader removes the lock and spool files when the
+    flight ends, and a periodic sweep removes those of dead leaders.
+
+    The flight runs at the pace of the leader's client. Followers hold a
+    shared lock on the spool, and if the leader's client goes away while
+    any are left, the leader finishes the flight in a background thread.
+    """
+    logger = logging.getLogger(__name__)
+    _swept_at = 0.0
+
+    @staticmethod
+    def stream(key, source_factory):
+        os.makedirs(FLIGHT_DIR, exist_ok=True)
+        SingleFlight._sweep()
+        key_hash = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:32]
+        lock_path = os.path.join(FLIGHT_DIR, f"flight-{key_hash}.lock")
+        while True:
+            lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                spool_fd, spool_name = SingleFlight._open_leader_spool(lock_fd)
+                os.close(lock_fd)
+                if spool_fd is None:
+                    # The flight ended before we could attach, compute on our own
+                    yield from source_factory()
+                    return
+                SingleFlight.logger.info(f"Joining in-flight computation for {key}")
+                yield from SingleFlight._follow(spool_fd, spool_name, lock_path)
+                return
+            except Exception:
+                os.close(lock_fd)
+                raise
+            if SingleFlight._is_current(lock_fd, lock_path):
+                break
+            # The previous leader removed this lock file after we opened it, lock the new one
+            os.close(lock_fd)
+
+        SingleFlight.logger.info(f"Starting flight for {key}")
+        yield from SingleFlight._lead(lock_fd, lock_path, key_hash, source_factory)
+
+    @staticmethod
+    def _lead(lock_fd, lock_path, key_hash, source_factory):
+        spool_name = f"flight-{key_hash}-{os.getpid()}-{uuid.uuid4().hex}.spool"
+        spool_path = os.path.join(FLIGHT_DIR, spool_name)
+        spool_fd = os.open(spool_path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o600)
+        flight = _Flight(lock_fd, lock_path, spool_fd, spool_path)
+        source = None
+        try:
+            os.write(spool_fd, SPOOL_HEADER.pack(RUNNING, 0))
+            os.ftruncate(lock_fd, 0)
+            os.pwrite(lock_fd, spool_name.encode("utf-8"), 0)
+
+            source = iter(source_factory())
+            for chunk in source:
+                if chunk:
+                    flight.write(chunk)
+                    yield chunk
+        except GeneratorExit:
+            if SingleFlight._has_followers(spool_fd):
+                # Our client went away but others are still reading, finish the flight for them
+                SingleFlight.logger.info(f"Leader left, finishing flight {spool_name} for its followers")
+                threading.Thread(
+                    target=SingleFlight._finish_in_background,
+                    args=(source, flight),
+                    name="single-flight", daemon=True
+                ).start()
+                return
+            SingleFlight._close_source(source)
+            flight.end(FAILED)
+            raise
+        except BaseException:
+            SingleFlight._close_source(source)
+            flight.end(FAILED)
+            raise
+        flight.end(COMPLETED)
+
+    @staticmethod
+    def _finish_in_background(source, flight):
+        status = FAILED
+        try:
+            for chunk in source:
+                if chunk:
+                    flight.write(chunk)
+            status = COMPLETED
+        except Exception as e:
+            SingleFlight.logger.error(f"Error finishing flight {flight.spool_path}: {e}")
+        finally:
+            flight.end(status)
+
+    @staticmethod
+    def _is_current(lock_fd, lock_path):
+        try:
+            return os.stat(lock_path).st_ino == os.fstat(lock_fd).st_ino
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def _sweep():
+        """
+        Removes the lock files of flights that no leader holds anymore, and
+        the spools named in them, which are left behind by leaders that died.
+        """
+        now = time.monotonic()
+        if now - SingleFlight._swept_at < SWEEP_SECONDS:
+            return
+        SingleFlight._swept_at = now
+        for entry in os.scandir(FLIGHT_DIR):
+            if not entry.name.endswith(".lock"):
+                continue
+            try:
+                lock_fd = os.open(entry.path, os.O_RDWR)
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                if not SingleFlight._is_current(lock_fd, entry.path):
+                    continue
+                spool_name = os.pread(lock_fd, 512, 0).decode("utf-8")
+                # Cleared first, so anyone who opened this file meanwhile computes on their own
+                os.ftruncate(lock_fd, 0)
+                if spool_name:
+                    try:
+                        os.unlink(os.path.join(FLIGHT_DIR, spool_name))
+                    except FileNotFoundError:
+                        pass
+                os.unlink(entry.path)
+            except BlockingIOError:
+                # A flight is running
+                continue
+            except Exception as e:
+                SingleFlight.logger.error(f"Error sweeping flight file {entry.name}: {e}")
+            finally:
+                os.close(lock_fd)
+
+    @staticmethod
+    def _close_source(source):
+        if source is not None and hasattr(source, "close"):
+            source.close()
+
+    @staticmethod
+    def _has_followers(spool_fd):
+        # Every follower holds a shared lock on the spool while it reads
+        try:
+            fcntl.flock(spool_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(spool_fd, fcntl.LOCK_UN)
+        return False
+
+    @staticmethod
+    def _open_leader_spool(lock_fd):
+        """
+        Opens the spool named in the lock file and returns (fd, name), or
+        (None, None) when there is none to attach to.
+        """
+        for delay in (0, 0.01, 0.05, 0.1):
+            time.sleep(delay)
+            spool_name = os.pread(lock_fd, 512, 0).decode("utf-8")
+            if not spool_name:
+                # The leader holds the lock but has not published its spool yet
+                continue
+            try:
+                spool_fd = os.open(os.path.join(FLIGHT_DIR, spool_name), os.O_RDONLY)
+            except FileNotFoundError:
+                return None, None
+            fcntl.flock(spool_fd, fcntl.LOCK_SH)
+            return spool_fd, spool_name
+        return None, None
+
+    @staticmethod
+    def _follow(spool_fd, spool_name, lock_path):
+        try:
+            decompressor = zlib.decompressobj()
+            offset = SPOOL_HEADER.size
+            delay = POLL_SECONDS[0]
+            while True:
+                data = os.pread(spool_fd, READ_SIZE, offset)
+                if data:
+                    offset += len(data)
+                    delay = POLL_SECONDS[0]
+                    data = decompressor.decompress(data)
+                    if data:
+                        yield data
+                    continue
+                status, size = SPOOL_HEADER.unpack(os.pread(spool_fd, SPOOL_HEADER.size, 0))
+                if status == COMPLETED:
+                    if offset >= SPOOL_HEADER.size + size:
+                        data = decompressor.flush()
+                        if data:
+                            yield data
+                        return
+                    continue
+                if status == FAILED:
+                    raise SingleFlightError("The shared report computation failed or was abandoned.")
+                if not SingleFlight._leader_alive(lock_path, spool_name):
+                    # Recheck, the leader may have finished between the read and the lock probe
+                    if SPOOL_HEADER.unpack(os.pread(spool_fd, SPOOL_HEADER.size, 0))[0] == RUNNING:
+                        raise SingleFlightError("The worker computing the shared report went away.")
+                    continue
+                time.sleep(delay)
+                delay = min(delay * 2, POLL_SECONDS[1])
+        finally:
+            os.close(spool_fd)
+
+    @staticmethod
+    def _leader_alive(lock_path, spool_name):
+        try:
+            lock_fd = os.open(lock_path, os.O_RDWR)
+        except FileNotFoundError:
+            # Leaders remove the lock file when their flight ends
+            return False
+        try:
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Locked, but possibly by the leader of a newer flight
+                return os.pread(lock_fd, 512, 0).decode("utf-8") == spool_name
+            return False
+        finally:
+            os.close(lock_fd)
+
+
+class _Flight:
+    """
+    The leader's side of a flight: compresses chunks into the spool and
+    publishes the outcome.
+    """
+    def __init__(self, lock_fd, lock_path, spool_fd, spool_path):
+        self.lock_fd = lock_fd
+        self.lock_path = lock_path
+        self.spool_fd = spool_fd
+        self.spool_path = spool_path
+        self.compressor = zlib.compressobj(SPOOL_COMPRESSION_LEVEL)
+        self.size = 0
+
+    def write(self, chunk):
+        # Sync flush, so followers can decompress everything written so far
+        self._append(self.compressor.compress(chunk) + self.compressor.flush(zlib.Z_SYNC_FLUSH))
+
+    def end(self, status):
+        if status == COMPLETED:
+            self._append(self.compressor.flush())
+        # Payload first, then the header, so a follower that sees COMPLETED has all the bytes
+        os.pwrite(self.spool_fd, SPOOL_HEADER.pack(status, self.size), 0)
+        # Followers keep reading through their own descriptors. We still hold the lock, so nobody else removes the lock file
+        os.unlink(self.spool_path)
+        os.unlink(self.lock_path)
+        os.close(self.spool_fd)
+        os.close(self.lock_fd)
+
+    def _append(self, data):
+        if data:
+            os.write(self.spool_fd, data)
+            self.size += len(data)
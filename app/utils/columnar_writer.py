@@ -0,0 +1,155 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from app.utils.request_profile import profile_stage, profile_count
+from app.utils.metrics import count_report_rows
+from constants import REPORT_PARQUET_ROW_GROUP_ROWS, REPORT_PARQUET_COMPRESSION
+
+PARQUET = "parquet"
+ARROW = "arrow"
+COLUMNAR_FORMATS = (PARQUET, ARROW)
+
+
+def write_columnar_stream(frames, output_format, column_types=None):
+    """
+    Writes DataFrame chunks as a Parquet file or an Arrow IPC stream,
+    yielding the encoded bytes as soon as each row group (or record batch)
+    is written. Yields nothing when frames holds no rows.
+
+    Columns listed in column_types (column -> 'string', 'boolean',
+    'timestamp' or 'float') get that type whatever their values. Other
+    columns are typed after the first non-empty chunk: entirely null ones
+    as strings, numeric (Decimal) ones as float64 like in the columnar
+    fetch path, so that later chunks always fit the schema.
+    """
+    sink = _ChunkSink()
+    writer = None
+    schema = None
+    converters = {}
+    pending = []
+    pending_rows = 0
+    try:
+        for frame in frames:
+            if frame.empty:
+                continue
+            with profile_stage("serialize"):
+                if schema is None:
+                    schema, converters = _schema_for(frame, column_types or {})
+                    writer = _open_writer(sink, schema, output_format)
+                if converters:
+                    frame = frame.assign(**{col: convert(frame[col]) for col, convert in converters.items()})
+
+                table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+                if output_format == ARROW:
+                    writer.write_table(table)
+                else:
+                    # Cursor chunks are smaller than a useful row group, buffer until one is full
+                    pending.append(table)
+                    pending_rows += table.num_rows
+                    if pending_rows >= REPORT_PARQUET_ROW_GROUP_ROWS:
+                        writer.write_table(pa.concat_tables(pending), row_group_size=REPORT_PARQUET_ROW_GROUP_ROWS)
+                        pending, pending_rows = [], 0
+            profile_count("rows_produced", table.num_rows)
+            count_report_rows(table.num_rows)
+            yield from sink.drain()
+
+        if writer is None:
+            return
+        with profile_stage("serialize"):
+            if pending:
+                writer.write_table(pa.concat_tables(pending), row_group_size=REPORT_PARQUET_ROW_GROUP_ROWS)
+            writer.close()
+        writer = None
+        yield from sink.drain()
+    finally:
+        if hasattr(frames, "close"):
+            frames.close()
+
+
+def _schema_for(frame, column_types):
+    """
+    Returns the stream schema and the per-column converters applied to every chunk.
+    """
+    schema = pa.Schema.from_pandas(frame, preserve_index=False)
+    converters = {}
+    for i, field in enumerate(schema):
+        if field.name in column_types:
+            arrow_type, converter = COLUMN_TYPES[column_types[field.name]]
+            schema = schema.set(i, field.with_type(arrow_type))
+            converters[field.name] = converter
+        elif pa.types.is_null(field.type):
+            schema = schema.set(i, field.with_type(pa.string()))
+            converters[field.name] = _to_string
+        elif pa.types.is_decimal(field.type):
+            # Precision and scale are inferred per chunk, a later chunk could overflow them
+            schema = schema.set(i, field.with_type(pa.float64()))
+            converters[field.name] = _to_float
+    return schema.remove_metadata(), converters
+
+
+def _to_string(series):
+    return series.map(str, na_action="ignore")
+
+
+def _to_float(series):
+    return pd.to_numeric(series, errors="coerce").astype("float64")
+
+
+def _to_boolean(series):
+    return series.astype("boolean")
+
+
+def _to_timestamp(series):
+    series = pd.to_datetime(series, errors="coerce")
+    if series.dt.tz is not None:
+        # Timezone-aware values are written as naive UTC
+        series = series.dt.tz_convert(None)
+    return series
+
+
+# Logical column type -> (Arrow type, converter applied to every chunk)
+COLUMN_TYPES = {
+    "string": (pa.string(), _to_string),
+    "boolean": (pa.bool_(), _to_boolean),
+    "timestamp": (pa.timestamp("us"), _to_timestamp),
+    "float": (pa.float64(), _to_float),
+}
+
+
+def _open_writer(sink, schema, output_format):
+    if output_format == PARQUET:
+        return pq.ParquetWriter(sink, schema, compression=REPORT_PARQUET_COMPRESSION)
+    if output_format == ARROW:
+        return pa.ipc.new_stream(sink, schema)
+    raise ValueError(f"Unsupported report format: {output_format}")
+
+
+class _ChunkSink:
+    """
+    Write-only file-like object the pyarrow writers encode into, drained
+    by the generator after every write.
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        if self.buffer:
+            data = bytes(self.buffer)
+            self.buffer = bytearray()
+            yield data
@@ -0,0 +1,98 @@
+import zlib
+from constants import REPORT_COMPRESSION_ENCODINGS, REPORT_GZIP_LEVEL, REPORT_ZSTD_LEVEL
+
+try:
+    import zstandard  # Optional, enables Content-Encoding: zstd
+except ImportError:
+    zstandard = None
+
+GZIP = "gzip"
+ZSTD = "zstd"
+GZIP_WBITS = 16 + zlib.MAX_WBITS  # zlib container with a gzip header and trailer
+
+
+def available_encodings():
+    """
+    Returns the configured content encodings this process can produce, in order of preference.
+    """
+    encodings = []
+    for encoding in REPORT_COMPRESSION_ENCODINGS.split(","):
+        encoding = encoding.strip().lower()
+        if encoding == GZIP or (encoding == ZSTD and zstandard is not None):
+            encodings.append(encoding)
+    return encodings
+
+
+def compress_stream(chunks, encoding, level=None):
+    """
+    Compresses an iterable of byte chunks incrementally. Yields nothing when
+    chunks yields nothing, so an empty report stays empty.
+    """
+    compressor = None
+    try:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if compressor is None:
+                compressor = _compressor(encoding, level)
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        if compressor is not None:
+            yield compressor.flush()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+async def compress_async_stream(chunks, encoding, level=None):
+    """
+    compress_stream for async iterables of byte chunks.
+    """
+    compressor = None
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            if compressor is None:
+                compressor = _compressor(encoding, level)
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        if compressor is not None:
+            yield compressor.flush()
+    finally:
+        if hasattr(chunks, "aclose"):
+            await chunks.aclose()
+
+
+def decompress_stream(chunks, encoding):
+    decompressor = _decompressor(encoding)
+    try:
+        for chunk in chunks:
+            data = decompressor.decompress(chunk)
+            if data:
+                yield data
+        if encoding == GZIP:
+            data = decompressor.flush()
+            if data:
+                yield data
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def _compressor(encoding, level=None):
+    if encoding == GZIP:
+        return zlib.compressobj(REPORT_GZIP_LEVEL if level is None else level, zlib.DEFLATED, GZIP_WBITS)
+    if encoding == ZSTD and zstandard is not None:
+        return zstandard.ZstdCompressor(level=REPORT_ZSTD_LEVEL if level is None else level).compressobj()
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def _decompressor(encoding):
+    if encoding == GZIP:
+        return zlib.decompressobj(GZIP_WBITS)
+    if encoding == ZSTD and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ValueError(f"Unsupported content encoding: {encoding}")
@@ -0,0 +1,141 @@
+import os
+import time
+import threading
+import contextvars
+from prometheus_client import (
+    REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+
+# With PROMETHEUS_MULTIPROC_DIR set (gunicorn.conf.py does), every worker process writes its samples
+# to files in that directory and /metrics aggregates them, so any worker can answer the scrape.
+MULTIPROCESS_ENABLED = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+ROW_BUCKETS = (0, 10, 100, 1000, 10000, 100000, 1000000, 10000000)
+BYTE_BUCKETS = (1024, 16 * 1024, 256 * 1024, 1024 ** 2, 16 * 1024 ** 2, 256 * 1024 ** 2, 1024 ** 3, 8 * 1024 ** 3)
+
+REPORT_DURATION = Histogram(
+    "report_duration_seconds", "Report request duration, until the last chunk was sent.",
+    ["status"], buckets=DURATION_BUCKETS
+)
+REPORT_STAGE_DURATION = Histogram(
+    "report_stage_duration_seconds", "Time per report request spent in each stage of the request profile.",
+    ["stage"], buckets=DURATION_BUCKETS
+)
+REPORT_ROWS = Histogram("report_rows", "Rows per generated report.", buckets=ROW_BUCKETS)
+REPORT_BYTES = Histogram("report_bytes", "Response bytes per generated report.", buckets=BYTE_BUCKETS)
+REPORT_ADMISSIONS = Counter(
+    "report_admissions", "Report admission decisions (admitted, queued, rejected).", ["result"]
+)
+REPORTS_IN_FLIGHT = Gauge(
+    "reports_in_flight", "Report requests currently being generated or streamed.", multiprocess_mode="livesum"
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Duration of report queries, including fetching the rows.",
+    ["table"], buckets=DURATION_BUCKETS
+)
+DB_ROWS_FETCHED = Counter("db_rows_fetched", "Rows fetched by report queries.", ["table"])
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections", "Pooled database connections by state.", ["state"], multiprocess_mode="livesum"
+)
+AUTH_DURATION = Histogram(
+    "auth_validation_duration_seconds", "Access token validation time.", ["result"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+)
+AUTH_TOKEN_CACHE = Counter("auth_token_cache", "Verified token cache lookups.", ["result"])
+
+
+def render_latest():
+    """
+    Returns the metrics in the Prometheus text format, aggregated over all
+    worker processes in multiprocess mode.
+    """
+    if MULTIPROCESS_ENABLED:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def observe_query(label, seconds, rows):
+    # Partition labels look like user_enrolment[2/4], keep the table name only
+    table = label.split("[", 1)[0]
+    DB_QUERY_DURATION.labels(table=table).observe(seconds)
+    if rows:
+        DB_ROWS_FETCHED.labels(table=table).inc(rows)
+
+
+_current_report = contextvars.ContextVar("report_observation", default=None)
+
+
+class ReportObservation:
+    """
+    Duration, rows and bytes of one report request, observed in the report
+    histograms when it finishes. Unlike the request profile it is always
+    recorded, so the metrics do not depend on REPORT_PROFILE_ENABLED.
+    Rows are counted through count_report_rows by the code that produces
+    them, reports served from the cache or a shared flight have no row count.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = time.perf_counter()
+        self.status = None
+        self.rows = None
+        self.bytes = 0
+        self.token = None
+        self.finished = False
+
+    @staticmethod
+    def start():
+        observation = ReportObservation()
+        observation.token = _current_report.set(observation)
+        return observation
+
+    def add_rows(self, rows):
+        with self.lock:
+            self.rows = (self.rows or 0) + rows
+
+    def add_bytes(self, size):
+        with self.lock:
+            self.bytes += size
+
+    def finish(self, stages=None):
+        """
+        Observes the report, with the stage times of its request profile if it had one.
+        """
+        if self.finished:
+            return
+        self.finished = True
+        if self.token is not None:
+            try:
+                _current_report.reset(self.token)
+            except ValueError:
+                # Finished from another context, e.g. at the end of a streamed response
+                _current_report.set(None)
+            self.token = None
+
+        REPORT_DURATION.labels(status=str(self.status)).observe(time.perf_counter() - self.started_at)
+        for stage, seconds in (stages or {}).items():
+            REPORT_STAGE_DURATION.labels(stage=stage).observe(seconds)
+        if self.rows is not None:
+            REPORT_ROWS.observe(self.rows)
+        if self.bytes:
+            REPORT_BYTES.observe(self.bytes)
+
+
+def count_report_rows(rows):
+    observation = _current_report.get()
+    if observation is not None:
+        observation.add_rows(rows)
+
+
+def count_report_bytes(size):
+    observation = _current_report.get()
+    if observation is not None:
+        observation.add_bytes(size)
+
+
+def set_pool_usage(in_use, idle):
+    DB_POOL_CONNECTIONS.labels(state="in_use").set(in_use)
+    DB_POOL_CONNECTIONS.labels(state="idle").set(idle)
@@ -0,0 +1,142 @@
+import json
+import time
+import logging
+import resource
+import threading
+import tracemalloc
+import contextvars
+from contextlib import contextmanager
+from constants import REPORT_PROFILE_ENABLED, REPORT_PROFILE_TRACEMALLOC
+
+_current_profile = contextvars.ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    """
+    Structured timing and size profile of one request.
+
+    The active profile lives in a context variable, so code deep in the
+    fetch and merge path records into it through profile_stage and
+    profile_count without having it passed around. Worker threads see it
+    when they are started through contextvars.copy_context(). Stage times
+    are summed per stage, stages measured in parallel threads can
+    therefore add up to more than the wall time.
+    """
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, name, **tags):
+        self.name = name
+        self.tags = tags
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+        self.queries = []
+        self.started_at = time.perf_counter()
+        self.start_max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.token = None
+        self.finished = False
+        if REPORT_PROFILE_TRACEMALLOC.lower() == 'true':
+            # tracemalloc is process wide, the peak covers concurrent requests as well
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+
+    @staticmethod
+    def start(name, **tags):
+        """
+        Starts a profile and makes it the current one, returns None when profiling is disabled.
+        """
+        if REPORT_PROFILE_ENABLED.lower() != 'true':
+            return None
+        profile = RequestProfile(name, **tags)
+        profile.token = _current_profile.set(profile)
+        return profile
+
+    @staticmethod
+    def current():
+        return _current_profile.get()
+
+    def add_time(self, stage, seconds):
+        with self.lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_count(self, counter, value):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def add_query(self, label, seconds, rows):
+        with self.lock:
+            self.queries.append({"label": label, "seconds": round(seconds, 4), "rows": rows})
+
+    def server_timing(self):
+        """
+        Returns a Server-Timing header value with the stages measured so far, in milliseconds.
+        """
+        with self.lock:
+            stages = dict(self.stages)
+        metrics = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in stages.items()]
+        metrics.append(f"total;dur={(time.perf_counter() - self.started_at) * 1000:.1f}")
+        return ", ".join(metrics)
+
+    def finish(self, **tags):
+        """
+        Emits the profile as one log record and detaches it from the current context.
+        """
+        if self.finished:
+            return None
+        self.finished = True
+        self.tags.update(tags)
+        max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        with self.lock:
+            record = {
+                "profile": self.name,
+                **self.tags,
+                "total_seconds": round(time.perf_counter() - self.started_at, 4),
+                "stages": {stage: round(seconds, 4) for stage, seconds in self.stages.items()},
+                "counters": dict(self.counters),
+                "queries": list(self.queries),
+                # Growth of the process high-water mark while the request ran
+                "max_rss_delta_kb": max_rss_kb - self.start_max_rss_kb
+            }
+        if tracemalloc.is_tracing():
+            record["tracemalloc_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+
+        if self.token is not None:
+            try:
+                _current_profile.reset(self.token)
+            except ValueError:
+                # Finished from another context, e.g. at the end of a streamed response
+                _current_profile.set(None)
+            self.token = None
+
+        RequestProfile.logger.info(f"Request profile: {json.dumps(record, default=str)}", extra={"request_profile": record})
+        return record
+
+
+@contextmanager
+def profile_stage(stage):
+    """
+    Adds the time spent in the block to stage of the current profile, if any.
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_time(stage, time.perf_counter() - started_at)
+
+
+def profile_count(counter, value):
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.add_count(counter, value)
+
+
+def profile_query(label, seconds, rows):
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.add_query(label, seconds, rows)
+
@@ -0,0 +1,201 @@
+import os
+import struct
+import base64
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from constants import REPORT_ENCRYPTION_SEGMENT_BYTES
+
+# Stream layout, all integers big-endian:
+#   header  = MAGIC | version (1) | salt (16) | nonce prefix (7)
+#   segment = final flag (1) | ciphertext length (4) | AES-256-GCM ciphertext and tag
+# Every stream derives its own key from the master key and the random salt
+# (HKDF-SHA256). The nonce of a segment is nonce prefix | segment index (4) |
+# final flag (1) and its associated data is header | segment index | final
+# flag, so segments cannot be reordered, dropped, replayed across streams or
+# truncated away without decryption failing.
+MAGIC = b"RPTE"
+VERSION = 1
+SALT_BYTES = 16
+NONCE_PREFIX_BYTES = 7
+HEADER_BYTES = len(MAGIC) + 1 + SALT_BYTES + NONCE_PREFIX_BYTES
+SEGMENT_HEADER = struct.Struct(">BI")
+TAG_BYTES = 16
+MAX_SEGMENTS = 2 ** 32
+HKDF_INFO = b"report-stream-v1"
+# Upper bound accepted when reading, streams written with a larger segment size elsewhere still decrypt
+MAX_SEGMENT_BYTES = 64 * 1024 * 1024 + TAG_BYTES
+
+
+class InvalidReportStream(Exception):
+    pass
+
+
+def decode_key(encoded_key):
+    """
+    Decodes a urlsafe base64 master key, as generated by Fernet.generate_key().
+    """
+    key = base64.urlsafe_b64decode(encoded_key)
+    if len(key) < 16:
+        raise ValueError("The report encryption key must be at least 16 bytes long.")
+    return key
+
+
+def encrypt_stream(chunks, key, segment_size=None):
+    """
+    Encrypts an iterable of byte chunks, yielding the encrypted stream as it is produced.
+    """
+    encryptor = StreamEncryptor(key, segment_size)
+    try:
+        yield encryptor.header
+        for chunk in chunks:
+            data = encryptor.update(chunk)
+            if data:
+                yield data
+        yield encryptor.finalize()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def decrypt_stream(chunks, key):
+    """
+    Decrypts an iterable of encrypted byte chunks, yielding plaintext as soon
+    as each segment is authenticated. Raises InvalidReportStream when the
+    stream was tampered with or is truncated.
+    """
+    decryptor = StreamDecryptor(key)
+    for chunk in chunks:
+        data = decryptor.update(chunk)
+        if data:
+            yield data
+    decryptor.finalize()
+
+
+def _derive_key(key, salt):
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=HKDF_INFO).derive(key)
+
+
+def _segment_nonce(nonce_prefix, index, final):
+    return nonce_prefix + struct.pack(">IB", index, final)
+
+
+class StreamEncryptor:
+    """
+    Encrypts a byte stream into framed AES-GCM segments of segment_size
+    plaintext bytes. Only one segment of plaintext is buffered at a time.
+    """
+
+    def __init__(self, key, segment_size=None):
+        self.segment_size = segment_size or REPORT_ENCRYPTION_SEGMENT_BYTES
+        salt = os.urandom(SALT_BYTES)
+        self.nonce_prefix = os.urandom(NONCE_PREFIX_BYTES)
+        self.header = MAGIC + bytes([VERSION]) + salt + self.nonce_prefix
+        self.aead = AESGCM(_derive_key(key, salt))
+        self.buffer = bytearray()
+        self.index = 0
+        self.finalized = False
+
+    def update(self, data):
+        """
+        Buffers data and returns the encrypted segments completed by it.
+        """
+        if self.finalized:
+            raise ValueError("The encryptor has already been finalized.")
+        self.buffer += data
+        output = bytearray()
+        # Keep a full segment back, the last one has to be written with the final flag
+        while len(self.buffer) > self.segment_size:
+            output += self._seal(bytes(self.buffer[:self.segment_size]), final=0)
+            del self.buffer[:self.segment_size]
+        return bytes(output)
+
+    def finalize(self):
+        """
+        Returns the final segment, which may hold no plaintext.
+        """
+        if self.finalized:
+            raise ValueError("The encryptor has already been finalized.")
+        self.finalized = True
+        segment = self._seal(bytes(self.buffer), final=1)
+        self.buffer = bytearray()
+        return segment
+
+    def _seal(self, plaintext, final):
+        if self.index >= MAX_SEGMENTS:
+            raise ValueError("Too many segments for one encrypted stream.")
+        nonce = _segment_nonce(self.nonce_prefix, self.index, final)
+        aad = self.header + struct.pack(">IB", self.index, final)
+        ciphertext = self.aead.encrypt(nonce, plaintext, aad)
+        self.index += 1
+        return SEGMENT_HEADER.pack(final, len(ciphertext)) + ciphertext
+
+
+class StreamDecryptor:
+    """
+    Incrementally decrypts a stream produced by StreamEncryptor. Plaintext is
+    only returned once the segment holding it has been authenticated.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.header = None
+        self.nonce_prefix = None
+        self.aead = None
+        self.buffer = bytearray()
+        self.index = 0
+        self.finished = False
+
+    def update(self, data):
+        self.buffer += data
+        if self.header is None:
+            if len(self.buffer) < HEADER_BYTES:
+                return b""
+            self._read_header()
+
+        output = bytearray()
+        while len(self.buffer) >= SEGMENT_HEADER.size:
+            if self.finished:
+                raise InvalidReportStream("Unexpected data after the final segment.")
+            final, length = SEGMENT_HEADER.unpack_from(self.buffer)
+            if final not in (0, 1) or length < TAG_BYTES or length > MAX_SEGMENT_BYTES:
+                raise InvalidReportStream("Malformed segment header.")
+            end = SEGMENT_HEADER.size + length
+            if len(self.buffer) < end:
+                break
+            output += self._open(bytes(self.buffer[SEGMENT_HEADER.size:end]), final)
+            del self.buffer[:end]
+        return bytes(output)
+
+    def finalize(self):
+        """
+        Raises InvalidReportStream unless the final segment has been read.
+        """
+        if not self.finished or self.buffer:
+            raise InvalidReportStream("The encrypted stream is truncated.")
+
+    def _read_header(self):
+        header = bytes(self.buffer[:HEADER_BYTES])
+        if header[:len(MAGIC)] != MAGIC:
+            raise InvalidReportStream("Not an encrypted report stream.")
+        if header[len(MAGIC)] != VERSION:
+            raise InvalidReportStream(f"Unsupported encrypted report stream version {header[len(MAGIC)]}.")
+        salt_start = len(MAGIC) + 1
+        salt = header[salt_start:salt_start + SALT_BYTES]
+        self.nonce_prefix = header[salt_start + SALT_BYTES:]
+        self.aead = AESGCM(_derive_key(self.key, salt))
+        self.header = header
+        del self.buffer[:HEADER_BYTES]
+
+    def _open(self, ciphertext, final):
+        nonce = _segment_nonce(self.nonce_prefix, self.index, final)
+        aad = self.header + struct.pack(">IB", self.index, final)
+        try:
+            plaintext = self.aead.decrypt(nonce, ciphertext, aad)
+        except InvalidTag:
+            raise InvalidReportStream(f"Segment {self.index} failed authentication.")
+        self.index += 1
+        self.finished = final == 1
+        return plaintext
+
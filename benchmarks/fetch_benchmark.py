@@ -0,0 +1,53 @@
+"""
+Compares the rows and columnar DataFetcher strategies on the configured database.
+
+Usage:
+    python -m benchmarks.fetch_benchmark --table user_enrolment --repeat 3
+    python -m benchmarks.fetch_benchmark --query "SELECT * FROM user_enrolment WHERE enrolled_on >= '2024-01-01'"
+"""
+import argparse
+import logging
+import time
+from app.services.fetch_data import DataFetcher
+from constants import USER_ENROLMENTS_TABLE
+
+
+def run(query, repeat):
+    results = {}
+    with DataFetcher() as fetcher:
+        for strategy in ("rows", "columnar"):
+            timings = []
+            row_count = 0
+            for _ in range(repeat):
+                start_time = time.perf_counter()
+                df = fetcher.fetch_query_as_dataframe(query, label=f"benchmark_{strategy}", strategy=strategy)
+                timings.append(time.perf_counter() - start_time)
+                row_count = len(df)
+                fetcher.connection.rollback()
+                del df
+            best = min(timings)
+            results[strategy] = (row_count, best, row_count / best if best else 0.0)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DataFetcher fetch strategies.")
+    parser.add_argument("--table", default=USER_ENROLMENTS_TABLE, help="Table to read in full.")
+    parser.add_argument("--query", help="Query to run instead of reading --table.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per strategy, the best one is reported.")
+    args = parser.parse_args()
+
+    logging.getLogger("app.services.fetch_data").setLevel(logging.WARNING)
+    query = args.query or f"SELECT * FROM {args.table}"
+    results = run(query, args.repeat)
+
+    print(f"{'strategy':<10} {'rows':>12} {'seconds':>10} {'rows/sec':>14}")
+    for strategy, (row_count, seconds, rows_per_sec) in results.items():
+        print(f"{strategy:<10} {row_count:>12} {seconds:>10.3f} {rows_per_sec:>14,.0f}")
+    rows_rate = results["rows"][2]
+    if rows_rate:
+        print(f"columnar speedup: {results['columnar'][2] / rows_rate:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,102 @@
 import os
+import tempfile
 
 DEFAULT_TABLE_NAME = os.environ.get('DEFAULT_TABLE_NAME', 'wf_status')
 USER_DETAILS_TABLE = os.environ.get('USER_DETAILS_TABLE', 'user_detail')
 CONTENT_TABLE = os.environ.get('CONTENT_TABLE', 'content')
 USER_ENROLMENTS_TABLE = os.environ.get('USER_ENROLMENTS_TABLE', 'user_enrolment')
+# 'pandas' merges per-table fetches in the worker, 'sql' pushes the join down into Postgres,
+# 'copy' additionally lets Postgres render the CSV through COPY ... TO STDOUT
+REPORT_EXECUTION_MODE = os.environ.get('REPORT_EXECUTION_MODE', 'pandas')
+# Rows pulled per round trip (and per DataFrame chunk) from server-side cursors
+DB_CURSOR_ITERSIZE = int(os.environ.get('DB_CURSOR_ITERSIZE', 20000))
+# Size of the CSV chunks handed from COPY ... TO STDOUT to the response
+DB_COPY_CHUNK_BYTES = int(os.environ.get('DB_COPY_CHUNK_BYTES', 262144))
+# Content catalog cache, 0 disables it. The watermark column is optional and is probed with max()
+CONTENT_CACHE_TTL_SECONDS = int(os.environ.get('CONTENT_CACHE_TTL_SECONDS', 300))
+CONTENT_CACHE_WATERMARK_COLUMN = os.environ.get('CONTENT_CACHE_WATERMARK_COLUMN', '')
+# The catalog is reloaded at least this often, even when the watermark probe sees no change
+CONTENT_CACHE_MAX_AGE_SECONDS = int(os.environ.get('CONTENT_CACHE_MAX_AGE_SECONDS', 60 * 60))
+# While the content cache is cold, fetch only the referenced content_ids if there are at most this many, 0 disables
+CONTENT_FILTER_MAX_IDS = int(os.environ.get('CONTENT_FILTER_MAX_IDS', 5000))
+# Background report jobs, results are kept on local disk shared by all workers of the pod
+REPORT_JOB_WORKERS = int(os.environ.get('REPORT_JOB_WORKERS', 2))
+REPORT_JOB_DIR = os.environ.get('REPORT_JOB_DIR', os.path.join(tempfile.gettempdir(), 'report-jobs'))
+REPORT_JOB_TTL_SECONDS = int(os.environ.get('REPORT_JOB_TTL_SECONDS', 86400))
+REPORT_JOB_HEARTBEAT_SECONDS = float(os.environ.get('REPORT_JOB_HEARTBEAT_SECONDS', 30))
+# Identical concurrent report requests share one computation across all workers of the pod,
+# coordinated through lock files and compressed spool files in REPORT_SPOOL_DIR (system temp dir by default)
+REPORT_SINGLE_FLIGHT_ENABLED = os.environ.get('REPORT_SINGLE_FLIGHT_ENABLED', 'true')
+REPORT_SPOOL_DIR = os.environ.get('REPORT_SPOOL_DIR') or None
+# On-disk cache of finished reports for closed date windows, REPORT_CACHE_MAX_BYTES=0 disables it.
+# Keys carry a watermark probed from the org's enrollments in the window (row count and the max of
+# REPORT_CACHE_WATERMARK_COLUMN), entries older than REPORT_CACHE_MAX_AGE_SECONDS are recomputed.
+# Bump REPORT_CACHE_DATA_VERSION whenever historical data is reloaded or corrected.
+REPORT_CACHE_DIR = os.environ.get('REPORT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'report-cache'))
+REPORT_CACHE_MAX_BYTES = int(os.environ.get('REPORT_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+REPORT_CACHE_CLOSED_AFTER_DAYS = int(os.environ.get('REPORT_CACHE_CLOSED_AFTER_DAYS', 2))
+REPORT_CACHE_DATA_VERSION = os.environ.get('REPORT_CACHE_DATA_VERSION', '1')
+REPORT_CACHE_WATERMARK_COLUMN = os.environ.get('REPORT_CACHE_WATERMARK_COLUMN', 'last_completed_on')
+REPORT_CACHE_MAX_AGE_SECONDS = int(os.environ.get('REPORT_CACHE_MAX_AGE_SECONDS', 24 * 60 * 60))
+# Fetch users, enrollments and content concurrently on separate pooled connections sharing one snapshot
+REPORT_PARALLEL_FETCH_ENABLED = os.environ.get('REPORT_PARALLEL_FETCH_ENABLED', 'false')
+# Number of parallel enrolled_on sub-ranges the pandas path scans enrollments in, 1 disables partitioning.
+# Capped at request time by the free connections of DB_POOL_MAX_SIZE
+REPORT_ENROLMENT_PARTITIONS = int(os.environ.get('REPORT_ENROLMENT_PARTITIONS', 1))
+# 'rows' builds DataFrames from fetched tuples, 'columnar' parses COPY output straight into typed columns
+DB_FETCH_STRATEGY = os.environ.get('DB_FETCH_STRATEGY', 'rows')
+# column__in filters with at least this many values are sent as one array literal (= ANY('{...}'::type[])),
+# from the temp table threshold on they are bulk loaded into a temporary table and semi-joined
+DB_IN_FILTER_ARRAY_THRESHOLD = int(os.environ.get('DB_IN_FILTER_ARRAY_THRESHOLD', 100))
+DB_IN_FILTER_TEMP_TABLE_THRESHOLD = int(os.environ.get('DB_IN_FILTER_TEMP_TABLE_THRESHOLD', 50000))
+# Master key (urlsafe base64, e.g. Fernet.generate_key()) for encrypted report streams, empty disables them
+REPORT_ENCRYPTION_KEY = os.environ.get('REPORT_ENCRYPTION_KEY', '')
+# Plaintext bytes per authenticated segment of an encrypted report stream
+REPORT_ENCRYPTION_SEGMENT_BYTES = int(os.environ.get('REPORT_ENCRYPTION_SEGMENT_BYTES', 64 * 1024))
+# Content encodings offered for report responses, in order of preference (zstd needs the zstandard package), empty disables compression
+REPORT_COMPRESSION_ENCODINGS = os.environ.get('REPORT_COMPRESSION_ENCODINGS', 'zstd,gzip')
+REPORT_GZIP_LEVEL = int(os.environ.get('REPORT_GZIP_LEVEL', 6))
+REPORT_ZSTD_LEVEL = int(os.environ.get('REPORT_ZSTD_LEVEL', 3))
+# format=parquet output: rows per row group (chunks are buffered up to this) and column compression codec
+REPORT_PARQUET_ROW_GROUP_ROWS = int(os.environ.get('REPORT_PARQUET_ROW_GROUP_ROWS', 100000))
+REPORT_PARQUET_COMPRESSION = os.environ.get('REPORT_PARQUET_COMPRESSION', 'snappy')
+# Memory per report the pandas path sizes its enrollment join batches for, 0 uses fixed DB_CURSOR_ITERSIZE batches.
+# Partitioned and parallel fetches still load the whole enrollment frame before joining it in batches
+REPORT_MEMORY_BUDGET_MB = int(os.environ.get('REPORT_MEMORY_BUDGET_MB', 256))
+# Per-request profile (stage timings, rows, bytes, memory) logged for every report request,
+# optionally sent as a Server-Timing header. tracemalloc adds noticeable allocation overhead
+REPORT_PROFILE_ENABLED = os.environ.get('REPORT_PROFILE_ENABLED', 'true')
+REPORT_PROFILE_SERVER_TIMING = os.environ.get('REPORT_PROFILE_SERVER_TIMING', 'false')
+REPORT_PROFILE_TRACEMALLOC = os.environ.get('REPORT_PROFILE_TRACEMALLOC', 'false')
+# Admission control for synchronous reports, shared by all workers of the pod through lock files.
+# A limit of 0 disables it. Requests over the per-org limit get 429 at once, requests over the
+# global limit wait in a bounded queue for a free slot, then get 429
+REPORT_ADMISSION_DIR = os.environ.get('REPORT_ADMISSION_DIR', os.path.join(tempfile.gettempdir(), 'report-admission'))
+REPORT_MAX_IN_FLIGHT = int(os.environ.get('REPORT_MAX_IN_FLIGHT', 0))
+REPORT_MAX_IN_FLIGHT_PER_ORG = int(os.environ.get('REPORT_MAX_IN_FLIGHT_PER_ORG', 2))
+REPORT_ADMISSION_QUEUE_SIZE = int(os.environ.get('REPORT_ADMISSION_QUEUE_SIZE', 8))
+REPORT_ADMISSION_WAIT_SECONDS = float(os.environ.get('REPORT_ADMISSION_WAIT_SECONDS', 10))
+REPORT_ADMISSION_RETRY_AFTER_SECONDS = int(os.environ.get('REPORT_ADMISSION_RETRY_AFTER_SECONDS', 30))
 REQUIRED_COLUMNS_FOR_ENROLLMENTS = ["user_id", "full_name", "content_id","content_name","content_type","content_type","certificate_id","enrolled_on","certificate_generated","first_completed_on","last_completed_on","content_duration","content_progress_percentage"]
 SUNBIRD_SSO_URL = os.environ.get('SUNBIRD_SSO_URL', 'https://sso.example.com')
 SUNBIRD_SSO_REALM = os.environ.get('SUNBIRD_SSO_REALM', 'https://sso.example.com')
 ACCESS_TOKEN_PUBLICKEY_BASEPATH = os.environ.get('accesstoken_publickey_basepath')
+# Seconds between checks of the public key directory for added, changed or removed keys. 0 disables reloading
+ACCESS_TOKEN_PUBLICKEY_RELOAD_SECONDS = float(os.environ.get('ACCESS_TOKEN_PUBLICKEY_RELOAD_SECONDS', 30))
 IS_VALIDATION_ENABLED = os.environ.get('IS_VALIDATION_ENABLED', 'false')
+# Verified access tokens kept per worker until they expire, so repeat requests skip the signature check. 0 disables it
+ACCESS_TOKEN_CACHE_MAX_ENTRIES = int(os.environ.get('ACCESS_TOKEN_CACHE_MAX_ENTRIES', 1024))
 X_AUTHENTICATED_USER_TOKEN = 'x-authenticated-user-token'
 postgres_db_user = os.environ.get('postgres_db_user', 'postgres')
 postgres_db_password = os.environ.get('postgres_db_password', 'password')
 postgres_db_host = os.environ.get('postgres_db_host', 'localhost')
 postgres_db_port = os.environ.get('postgres_db_port', 5433)
 postgres_db_name = os.environ.get('postgres_db_name', 'warehouse')
+DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', 1))
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 10))
+DB_POOL_CHECKOUT_TIMEOUT = float(os.environ.get('DB_POOL_CHECKOUT_TIMEOUT', 30))
+# /health waits only briefly, a pool busy with reports is reported as busy rather than down
+HEALTH_CHECK_CHECKOUT_TIMEOUT = float(os.environ.get('HEALTH_CHECK_CHECKOUT_TIMEOUT', 2))
+# Pooled connections idle for longer than this are pinged before they are handed out
+DB_POOL_PING_IDLE_SECONDS = float(os.environ.get('DB_POOL_PING_IDLE_SECONDS', 30))
 postgres_db_url = f"postgresql://{postgres_db_user}:{postgres_db_password}@{postgres_db_host}:{postgres_db_port}/{postgres_db_name}"
\ No newline at end of file
@@ -0,0 +1,23 @@
+import os
+import shutil
+import tempfile
+
+# Metrics of all workers are aggregated through files in this directory, see app/utils/metrics.py.
+# It has to be set before the workers import prometheus_client.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "report-metrics"))
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("GUNICORN_WORKERS", "4"))
+timeout = 900
+
+
+def on_starting(server):
+    # Samples of a previous run would otherwise be added to the new counters
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,60 @@
+from collections import namedtuple
+from io import BytesIO
+import pandas as pd
+import pytest
+from app.services import fetch_data
+from app.services.fetch_data import _copy_csv_to_dataframe
+
+Column = namedtuple("Column", ["name", "type_code"])
+DESCRIPTION = [
+    Column("user_id", 25),  # text
+    Column("full_name", 25),
+    Column("certificate_generated", 16),  # bool
+    Column("attempts", 23),  # int4
+    Column("progress", 1700),  # numeric
+    Column("first_completed_on", 1114),  # timestamp
+    Column("created_at", 1184),  # timestamptz
+]
+# As written by COPY ... WITH (FORMAT csv, NULL '\N'): NULL is a bare \N, an empty string is quoted
+COPY_OUTPUT = (
+    b'u1,"Name, 1",t,3,52.5,2024-01-02 03:04:00,2024-01-02 03:04:00+00\n'
+    b'u2,\\N,\\N,\\N,\\N,\\N,\\N\n'
+    b'u3,"",f,0,0,2024-02-01 00:00:00,2024-02-01 00:00:00+00\n'
+    b'u4,"\\N",t,1,1.5,\\N,\\N\n'
+)
+
+
+@pytest.fixture(params=["pyarrow", "c"])
+def parser(request, monkeypatch):
+    if request.param == "pyarrow":
+        if fetch_data.pyarrow is None:
+            pytest.skip("pyarrow is not installed")
+    else:
+        monkeypatch.setattr(fetch_data, "pyarrow", None)
+    return request.param
+
+
+def test_nulls_and_empty_strings(parser):
+    df = _copy_csv_to_dataframe(BytesIO(COPY_OUTPUT), DESCRIPTION)
+
+    assert list(df.columns) == [column.name for column in DESCRIPTION]
+    assert df["user_id"].tolist() == ["u1", "u2", "u3", "u4"]
+    assert df.loc[0, "full_name"] == "Name, 1"
+    assert pd.isna(df.loc[1, "full_name"])
+    assert df.loc[2, "full_name"] == ""
+    if parser == "pyarrow":
+        # Only the pyarrow parser can tell a quoted \N text value from NULL
+        assert df.loc[3, "full_name"] == "\\N"
+    assert df.loc[1, ["certificate_generated", "attempts", "progress", "first_completed_on", "created_at"]].isna().all()
+
+
+def test_column_types(parser):
+    df = _copy_csv_to_dataframe(BytesIO(COPY_OUTPUT), DESCRIPTION)
+
+    assert df.loc[0, "certificate_generated"] == True  # noqa: E712
+    assert df.loc[2, "certificate_generated"] == False  # noqa: E712
+    assert df["attempts"].dtype == "Int64"
+    assert df.loc[0, "progress"] == 52.5
+    assert pd.api.types.is_datetime64_any_dtype(df["first_completed_on"])
+    assert df.loc[0, "first_completed_on"] == pd.Timestamp("2024-01-02 03:04:00")
+    assert df.loc[0, "created_at"] == pd.Timestamp("2024-01-02 03:04:00", tz="UTC")
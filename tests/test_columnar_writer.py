@@ -0,0 +1,52 @@
+from datetime import datetime
+from decimal import Decimal
+from io import BytesIO
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from app.services.report_query import ReportQueryBuilder
+from app.utils.columnar_writer import ARROW, PARQUET, write_columnar_stream
+
+
+def _chunks():
+    # Columns that are entirely null in the first chunk must keep their type
+    yield pd.DataFrame({
+        "user_id": ["u1", "u2"],
+        "certificate_generated": [None, None],
+        "first_completed_on": [None, None],
+        "content_duration": [Decimal("1.5"), None],
+        "content_name": [None, None],
+    })
+    yield pd.DataFrame({
+        "user_id": ["u3"],
+        "certificate_generated": [True],
+        "first_completed_on": [datetime(2024, 1, 2, 3, 4)],
+        "content_duration": [Decimal("2")],
+        "content_name": ["Course"],
+    })
+
+
+def _read(data, output_format):
+    if output_format == PARQUET:
+        return pq.read_table(BytesIO(data))
+    return pa.ipc.open_stream(BytesIO(data)).read_all()
+
+
+@pytest.mark.parametrize("output_format", [PARQUET, ARROW])
+def test_schema_follows_column_types(output_format):
+    data = b"".join(write_columnar_stream(_chunks(), output_format, column_types=ReportQueryBuilder.COLUMN_TYPES))
+    table = _read(data, output_format)
+
+    assert table.schema.field("user_id").type == pa.string()
+    assert table.schema.field("certificate_generated").type == pa.bool_()
+    assert table.schema.field("first_completed_on").type == pa.timestamp("us")
+    assert table.schema.field("content_duration").type == pa.float64()
+    assert table.schema.field("content_name").type == pa.string()
+    assert table.column("first_completed_on").to_pylist() == [None, None, datetime(2024, 1, 2, 3, 4)]
+    assert table.column("certificate_generated").to_pylist() == [None, None, True]
+    assert table.column("content_duration").to_pylist() == [1.5, None, 2.0]
+
+
+def test_empty_stream_yields_nothing():
+    assert list(write_columnar_stream(iter([pd.DataFrame()]), PARQUET, column_types=ReportQueryBuilder.COLUMN_TYPES)) == []
@@ -0,0 +1,13 @@
+from app.services.fetch_data import _array_literal
+
+
+def test_array_literal_quotes_every_element():
+    assert _array_literal(["u1", "u2"]) == '{"u1","u2"}'
+
+
+def test_array_literal_escapes_quotes_and_backslashes():
+    assert _array_literal(['a"b', "c\\d", "{e,f}"]) == '{"a\\"b","c\\\\d","{e,f}"}'
+
+
+def test_array_literal_keeps_nulls():
+    assert _array_literal(["u1", None]) == '{"u1",NULL}'
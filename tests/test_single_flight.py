@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+import pytest
+from app.services import single_flight
+from app.services.single_flight import SingleFlight, SingleFlightError
+
+CHUNKS = [f"row {i},{'x' * 100}\n".encode() for i in range(200)]
+
+
+@pytest.fixture(autouse=True)
+def flight_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(single_flight, "FLIGHT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _slow_source(calls, fail_at=None):
+    def source():
+        calls.append(1)
+        for i, chunk in enumerate(CHUNKS):
+            if i == fail_at:
+                raise RuntimeError("source failed")
+            time.sleep(0.001)
+            yield chunk
+    return source
+
+
+def _run_concurrently(count, target):
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def run(i):
+        barrier.wait()
+        try:
+            results[i] = target(i)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_callers_share_one_computation(flight_dir):
+    calls = []
+    results = _run_concurrently(4, lambda i: b"".join(SingleFlight.stream("key", _slow_source(calls))))
+
+    assert results == [b"".join(CHUNKS)] * 4
+    assert len(calls) == 1
+    assert os.listdir(flight_dir) == []
+
+
+def test_followers_finish_when_the_leader_leaves(flight_dir):
+    calls = []
+
+    def consume(i):
+        stream = SingleFlight.stream("key", _slow_source(calls))
+        if i == 0:
+            next(stream)
+            time.sleep(0.05)  # Let the others join before leaving
+            stream.close()
+            return None
+        return b"".join(stream)
+
+    results = _run_concurrently(3, consume)
+    assert len(calls) == 1
+    assert [result for result in results if result is not None] == [b"".join(CHUNKS)] * 2
+    deadline = time.monotonic() + 5
+    while os.listdir(flight_dir) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert os.listdir(flight_dir) == []
+
+
+def test_source_failure_reaches_every_caller(flight_dir):
+    calls = []
+    results = _run_concurrently(3, lambda i: b"".join(SingleFlight.stream("key", _slow_source(calls, fail_at=100))))
+
+    assert len(calls) == 1
+    assert sum(isinstance(result, RuntimeError) for result in results) == 1
+    assert sum(isinstance(result, SingleFlightError) for result in results) == 2
+    assert os.listdir(flight_dir) == []
+
+
+def test_sweep_removes_files_of_dead_flights(flight_dir, monkeypatch):
+    (flight_dir / "flight-dead.lock").write_text("flight-dead-1-abc.spool")
+    (flight_dir / "flight-dead-1-abc.spool").write_bytes(b"partial")
+    monkeypatch.setattr(SingleFlight, "_swept_at", 0.0)
+    monkeypatch.setattr(single_flight, "SWEEP_SECONDS", 0)
+
+    assert b"".join(SingleFlight.stream("other", lambda: iter(CHUNKS))) == b"".join(CHUNKS)
+    assert os.listdir(flight_dir) == []
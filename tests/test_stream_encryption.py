@@ -0,0 +1,139 @@
+import os
+import base64
+import pytest
+from app.utils.stream_encryption import (
+    HEADER_BYTES, SEGMENT_HEADER, TAG_BYTES, InvalidReportStream, decode_key, decrypt_stream, encrypt_stream
+)
+
+KEY = os.urandom(32)
+SEGMENT_SIZE = 64
+
+
+def _encrypt(plaintext, chunk_size=None, key=KEY):
+    chunk_size = chunk_size or max(len(plaintext), 1)
+    chunks = [plaintext[i:i + chunk_size] for i in range(0, len(plaintext), chunk_size)]
+    return b"".join(encrypt_stream(chunks, key, segment_size=SEGMENT_SIZE))
+
+
+def _decrypt(ciphertext, chunk_size=None, key=KEY):
+    chunk_size = chunk_size or max(len(ciphertext), 1)
+    chunks = [ciphertext[i:i + chunk_size] for i in range(0, len(ciphertext), chunk_size)]
+    return b"".join(decrypt_stream(chunks, key))
+
+
+def _segments(ciphertext):
+    """
+    Splits an encrypted stream into its header and raw segments.
+    """
+    header, offset, segments = ciphertext[:HEADER_BYTES], HEADER_BYTES, []
+    while offset < len(ciphertext):
+        _, length = SEGMENT_HEADER.unpack_from(ciphertext, offset)
+        end = offset + SEGMENT_HEADER.size + length
+        segments.append(ciphertext[offset:end])
+        offset = end
+    return header, segments
+
+
+@pytest.mark.parametrize("size", [
+    0, 1, SEGMENT_SIZE - 1, SEGMENT_SIZE, SEGMENT_SIZE + 1, 2 * SEGMENT_SIZE, 2 * SEGMENT_SIZE + 1, 10 * SEGMENT_SIZE + 7
+])
+def test_round_trip(size):
+    plaintext = os.urandom(size)
+    assert _decrypt(_encrypt(plaintext)) == plaintext
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, SEGMENT_SIZE, 1000])
+def test_round_trip_independent_of_chunking(chunk_size):
+    plaintext = os.urandom(5 * SEGMENT_SIZE + 3)
+    ciphertext = _encrypt(plaintext, chunk_size=chunk_size)
+    assert _decrypt(ciphertext, chunk_size=chunk_size) == plaintext
+
+
+def test_empty_input_still_has_a_final_segment():
+    ciphertext = _encrypt(b"")
+    header, segments = _segments(ciphertext)
+    assert len(header) == HEADER_BYTES
+    assert len(segments) == 1
+    assert len(segments[0]) == SEGMENT_HEADER.size + TAG_BYTES
+
+
+def test_full_last_segment_is_sent_as_final():
+    _, segments = _segments(_encrypt(os.urandom(2 * SEGMENT_SIZE)))
+    assert [SEGMENT_HEADER.unpack_from(segment)[0] for segment in segments] == [0, 1]
+
+
+def test_streams_of_the_same_plaintext_differ():
+    plaintext = os.urandom(3 * SEGMENT_SIZE)
+    assert _encrypt(plaintext) != _encrypt(plaintext)
+
+
+@pytest.mark.parametrize("cut", [1, HEADER_BYTES - 1, HEADER_BYTES, HEADER_BYTES + SEGMENT_HEADER.size, -1])
+def test_truncated_stream_is_rejected(cut):
+    ciphertext = _encrypt(os.urandom(3 * SEGMENT_SIZE))
+    with pytest.raises(InvalidReportStream):
+        _decrypt(ciphertext[:cut])
+
+
+def test_stream_without_final_segment_is_rejected():
+    header, segments = _segments(_encrypt(os.urandom(3 * SEGMENT_SIZE)))
+    with pytest.raises(InvalidReportStream):
+        _decrypt(header + b"".join(segments[:-1]))
+
+
+def test_reordered_segments_are_rejected():
+    header, segments = _segments(_encrypt(os.urandom(3 * SEGMENT_SIZE)))
+    segments[0], segments[1] = segments[1], segments[0]
+    with pytest.raises(InvalidReportStream):
+        _decrypt(header + b"".join(segments))
+
+
+def test_dropped_segment_is_rejected():
+    header, segments = _segments(_encrypt(os.urandom(3 * SEGMENT_SIZE)))
+    with pytest.raises(InvalidReportStream):
+        _decrypt(header + b"".join(segments[:1] + segments[2:]))
+
+
+def test_segment_from_another_stream_is_rejected():
+    plaintext = os.urandom(3 * SEGMENT_SIZE)
+    header, segments = _segments(_encrypt(plaintext))
+    _, other_segments = _segments(_encrypt(plaintext))
+    segments[1] = other_segments[1]
+    with pytest.raises(InvalidReportStream):
+        _decrypt(header + b"".join(segments))
+
+
+def test_data_after_final_segment_is_rejected():
+    ciphertext = _encrypt(os.urandom(SEGMENT_SIZE))
+    _, segments = _segments(ciphertext)
+    with pytest.raises(InvalidReportStream):
+        _decrypt(ciphertext + segments[-1])
+
+
+@pytest.mark.parametrize("position", [0, len(b"RPTE"), HEADER_BYTES - 1, HEADER_BYTES, HEADER_BYTES + SEGMENT_HEADER.size, -1])
+def test_tampered_byte_is_rejected(position):
+    ciphertext = bytearray(_encrypt(os.urandom(2 * SEGMENT_SIZE + 5)))
+    ciphertext[position] ^= 0x01
+    with pytest.raises(InvalidReportStream):
+        _decrypt(bytes(ciphertext))
+
+
+def test_wrong_key_is_rejected():
+    ciphertext = _encrypt(os.urandom(SEGMENT_SIZE))
+    with pytest.raises(InvalidReportStream):
+        _decrypt(ciphertext, key=os.urandom(32))
+
+
+def test_plaintext_is_only_released_after_authentication():
+    ciphertext = bytearray(_encrypt(os.urandom(3 * SEGMENT_SIZE)))
+    _, segments = _segments(bytes(ciphertext))
+    # Corrupt the tag of the first segment, nothing may be yielded before the error
+    ciphertext[HEADER_BYTES + len(segments[0]) - 1] ^= 0x01
+    decrypted = decrypt_stream([bytes(ciphertext)], KEY)
+    with pytest.raises(InvalidReportStream):
+        next(decrypted)
+
+
+def test_decode_key_rejects_short_keys():
+    assert decode_key("a" * 44) == base64.urlsafe_b64decode("a" * 44)
+    with pytest.raises(ValueError):
+        decode_key("YWJj")